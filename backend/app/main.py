@@ -1,28 +1,37 @@
 """FastAPI application entrypoints for EcoLang.
 
 This module exposes HTTP endpoints used by the frontend and tests. It keeps
-handlers intentionally small: each `/run` request constructs a fresh
+handlers intentionally small: each `/run` request builds a fresh
 `Interpreter` to avoid cross-request state sharing and calls the interpreter's
 public API. Server-side caps are enforced to prevent clients from overriding
 resource/safety limits.
 """
 
+import asyncio
+import functools
+import logging
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
 
 import os
 import bcrypt
 import jwt
+import orjson
 from datetime import datetime, timedelta
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 
 from .. import db
+from ..ecolang import subprocess_runner
 from ..ecolang.interpreter import Interpreter
 
-app = FastAPI(title="EcoLang API", version="0.1")
+# orjson-backed responses: `/run` results and `/stats` rows are encoded in C.
+app = FastAPI(title="EcoLang API", version="0.1", default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
 
 # Development CORS / connection guidance
 #
@@ -117,26 +126,61 @@ def login(data: AuthLogin):
     return TokenOut(access_token=token)
 
 
+# Server-side ceilings and eco defaults, read once from a throwaway
+# Interpreter at import time instead of constructing one per request.
+_DEFAULTS: Dict[str, Any] = {
+    k: getattr(Interpreter(), k)
+    for k in (
+        "max_steps",
+        "max_loop",
+        "max_time_s",
+        "max_output_chars",
+        "energy_per_op_J",
+        "idle_power_W",
+        "co2_per_kwh_g",
+    )
+}
+
+
+# Caps used when a request carries no settings at all (the common case).
+_SAFE_CAPS: Dict[str, Any] = {
+    "max_steps": _DEFAULTS["max_steps"],
+    "max_loop": _DEFAULTS["max_loop"],
+    "max_time_s": _DEFAULTS["max_time_s"],
+    "max_output_chars": _DEFAULTS["max_output_chars"],
+}
+
+
 def _cap_settings(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Enforce server-side safe caps for runtime tunables.
 
     Clients may include a `settings` object with per-run tunables. The server
     must not trust these entirely; `_cap_settings` establishes a conservative
-    ceiling using a fresh `Interpreter()` defaults and then applies the
-    client's requested values up to those ceilings.
+    ceiling using the Interpreter defaults cached in `_DEFAULTS` and then
+    applies the client's requested values up to those ceilings.
+
+    Results for hashable settings are memoized (see `_cap_items`), since
+    clients tend to resend the same few configurations.
 
     Returns a dict suitable for passing directly into `Interpreter.run`.
     """
-    # create a fresh Interpreter to obtain server-side safe defaults
-    defaults = Interpreter()
-    safe = {
-        "max_steps": defaults.max_steps,
-        "max_loop": defaults.max_loop,
-        "max_time_s": defaults.max_time_s,
-        "max_output_chars": defaults.max_output_chars,
-    }
     if not settings:
-        return safe
+        return dict(_SAFE_CAPS)
+    try:
+        # copy so callers never mutate the memoized result
+        return dict(_cap_items(tuple(sorted(settings.items()))))
+    except TypeError:
+        # unhashable or unorderable values: take the uncached path
+        return _compute_caps(settings)
+
+
+@functools.lru_cache(maxsize=256)
+def _cap_items(items: Tuple[Tuple[str, Any], ...]) -> Dict[str, Any]:
+    return _compute_caps(dict(items))
+
+
+def _compute_caps(settings: Dict[str, Any]) -> Dict[str, Any]:
+    safe = _SAFE_CAPS
     caps = {}
     # coerce and clamp numeric values to the server's safe maximums
     caps["max_steps"] = min(int(settings.get("max_steps", safe["max_steps"])), safe["max_steps"])
@@ -144,16 +188,59 @@ def _cap_settings(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     caps["max_time_s"] = min(float(settings.get("max_time_s", safe["max_time_s"])), safe["max_time_s"])
     caps["max_output_chars"] = min(int(settings.get("max_output_chars", safe["max_output_chars"])), safe["max_output_chars"])
     # include other eco-related settings which are read by the interpreter
-    caps["energy_per_op_J"] = float(settings.get("energy_per_op_J", defaults.energy_per_op_J))
-    caps["idle_power_W"] = float(settings.get("idle_power_W", defaults.idle_power_W))
-    caps["co2_per_kwh_g"] = float(settings.get("co2_per_kwh_g", defaults.co2_per_kwh_g))
+    caps["energy_per_op_J"] = float(
+        settings.get("energy_per_op_J", _DEFAULTS["energy_per_op_J"])
+    )
+    caps["idle_power_W"] = float(
+        settings.get("idle_power_W", _DEFAULTS["idle_power_W"])
+    )
+    caps["co2_per_kwh_g"] = float(
+        settings.get("co2_per_kwh_g", _DEFAULTS["co2_per_kwh_g"])
+    )
     return caps
 
 
+def _run_interpreter(
+    code: str, inputs: Dict[str, Any], capped: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Run `code` on a fresh Interpreter configured with `capped` settings."""
+    # construction applies the caps in a single reset; eco tunables are also
+    # read from the settings by `run`
+    it = Interpreter(capped)
+    return it.run(code, inputs=inputs, settings=capped)
+
+
+# Thread pool that runs interpreter work off the event loop. Created at
+# startup (or lazily, e.g. when a TestClient is used without lifespan events).
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1, thread_name_prefix="ecolang-run"
+        )
+    return _EXECUTOR
+
+
 @app.on_event('startup')
 def startup():
-    """FastAPI startup event: initialize the database connection/schema."""
+    """FastAPI startup event: initialize the database and the interpreter executor."""
     db.init_db()
+    _get_executor()
+
+
+@app.on_event('shutdown')
+def shutdown():
+    """FastAPI shutdown event: stop the interpreter executor and sandbox workers."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False)
+        _EXECUTOR = None
+    # the persistent sandbox workers are started lazily on first use, so
+    # there may be no pool to close
+    subprocess_runner.close_shared_pool()
 
 
 class RunRequest(BaseModel):
@@ -164,38 +251,57 @@ class RunRequest(BaseModel):
         inputs: optional mapping for `ask` statements.
         settings: optional runtime tunables; will be capped server-side.
         script_id: optional id to associate this run with a saved script.
+
+    Validation runs in pydantic v2 strict mode: JSON values must already have
+    the declared types, which skips the per-field coercion machinery.
     """
+    model_config = ConfigDict(strict=True)
+
     code: str
     inputs: Optional[Dict[str, Any]] = None
     settings: Optional[Dict[str, Any]] = None
     script_id: Optional[int] = None
 
 
+def _persist_run(
+    script_id: Optional[int], eco: Dict[str, Any], duration_ms: Optional[int]
+) -> None:
+    """Background task: store a run's eco stats, logging (not raising) on failure."""
+    try:
+        db.save_run(
+            script_id,
+            eco.get("energy_J"),
+            eco.get("energy_kWh"),
+            eco.get("co2_g"),
+            eco.get("total_ops"),
+            duration_ms,
+            eco.get("tips"),
+        )
+    except Exception:
+        logger.exception("Failed to persist run")
+
+
 @app.post("/run")
-async def run_code(req: RunRequest):
+async def run_code(req: RunRequest, background: BackgroundTasks):
     """Handle a code execution request.
 
-    This endpoint builds a fresh `Interpreter` instance per-request to ensure
-    isolation. It enforces server-side caps, applies them to the instance, and
-    calls `Interpreter.run`. On success it optionally persists eco stats to
-    the database. Any exceptions are turned into a SERVER_ERROR response so
-    callers receive a stable JSON shape.
+    This endpoint builds a fresh `Interpreter` per request so each request
+    starts from clean state. It enforces server-side caps, applies them
+    to the instance, and calls `Interpreter.run` on a worker thread so the
+    event loop stays free while the interpreter runs. Successful eco stats are
+    persisted in a background task after the response is sent, so DB latency
+    stays off the request path.
+    Any exceptions are turned into a SERVER_ERROR response so callers receive
+    a stable JSON shape.
     """
-    start = time.time()
+    start = time.perf_counter_ns()
     try:
-        # enforce server-side caps and create a fresh Interpreter for this request
+        # enforce server-side caps, then run on the executor so the CPU-bound
+        # interpreter does not block the event loop for concurrent requests
         capped = _cap_settings(req.settings or {})
-        it = Interpreter()
-        # apply caps to this per-request interpreter instance
-        it.max_steps = capped.get("max_steps", it.max_steps)
-        it.max_loop = capped.get("max_loop", it.max_loop)
-        it.max_time_s = capped.get("max_time_s", it.max_time_s)
-        it.max_output_chars = capped.get("max_output_chars", it.max_output_chars)
-        # run with the capped settings (eco tunables are read from settings by interpreter)
-        result = it.run(
-            req.code,
-            inputs=req.inputs or {},
-            settings=capped,
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            _get_executor(), _run_interpreter, req.code, req.inputs or {}, capped
         )
     except Exception as e:
         # Return a consistent error payload instead of raising
@@ -203,32 +309,23 @@ async def run_code(req: RunRequest):
             "output": "",
             "warnings": [],
             "eco": None,
-            "duration_ms": int((time.time() - start) * 1000),
+            "duration_ms": (time.perf_counter_ns() - start) // 1_000_000,
             "errors": {"code": "SERVER_ERROR", "message": str(e)},
         }
-    result["duration_ms"] = int((time.time()-start)*1000)
+    result["duration_ms"] = (time.perf_counter_ns() - start) // 1_000_000
 
-    # persist successful runs (non-fatal; on failure we append a warning)
-    try:
-        if result.get('errors') is None and result.get('eco'):
-            eco = result['eco']
-            db.save_run(
-                req.script_id,
-                eco.get("energy_J"),
-                eco.get("energy_kWh"),
-                eco.get("co2_g"),
-                eco.get("total_ops"),
-                result.get("duration_ms"),
-                eco.get("tips"),
-            )
-    except Exception as e:
-        # non-fatal: include warning but don't fail the request
-        result.setdefault('warnings', []).append(f"Failed to persist run: {e}")
+    # persist successful runs after the response has been sent
+    if result.get('errors') is None and result.get('eco'):
+        background.add_task(
+            _persist_run, req.script_id, result["eco"], result.get("duration_ms")
+        )
 
     return result
 
 
 class SaveScriptRequest(BaseModel):
+    model_config = ConfigDict(strict=True)
+
     title: str
     code: str
     eco_stats: Optional[Dict[str, Any]] = None
@@ -258,11 +355,33 @@ async def get_script(script_id: int, user_id: int = Depends(get_current_user_id)
     return s
 
 
-@app.get('/stats')
-async def list_stats(script_id: Optional[int] = None, user_id: int = Depends(get_current_user_id)):
+def _check_script_access(script_id: Optional[int], user_id: int) -> None:
     # If script_id provided, ensure it belongs to user
     if script_id:
         s = db.get_script(script_id)
         if not s or s.get("user_id") not in (None, user_id):
             raise HTTPException(status_code=403, detail="forbidden")
+
+
+@app.get('/stats')
+async def list_stats(script_id: Optional[int] = None, user_id: int = Depends(get_current_user_id)):
+    _check_script_access(script_id, user_id)
     return db.list_runs(script_id)
+
+
+@app.get('/stats/stream')
+async def stream_stats(
+    script_id: Optional[int] = None, user_id: int = Depends(get_current_user_id)
+):
+    """Stream the same rows as `/stats` as NDJSON, one run per line.
+
+    Rows are encoded as they are read from the DB, so memory stays
+    proportional to a page of rows and the first bytes go out immediately.
+    `db.iter_runs` parses `tips` exactly like `db.list_runs`, so corrupt
+    stored values come out as an empty list rather than a broken line.
+    """
+    _check_script_access(script_id, user_id)
+    return StreamingResponse(
+        (orjson.dumps(row) + b"\n" for row in db.iter_runs(script_id)),
+        media_type="application/x-ndjson",
+    )
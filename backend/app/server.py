@@ -0,0 +1,33 @@
+"""Production entrypoint: run the EcoLang API under uvicorn with fast I/O.
+
+`python -m backend.app.server` starts uvicorn with the uvloop event loop and
+the httptools HTTP parser (both installed by `uvicorn[standard]`), which
+cut per-request server overhead compared to the pure-Python defaults.
+
+Environment variables:
+    HOST: bind address (default 0.0.0.0)
+    PORT: bind port (default 8000)
+    WEB_CONCURRENCY: number of worker processes (default: CPU count)
+"""
+
+import os
+
+import uvicorn
+
+
+def main() -> None:
+    """Start uvicorn serving `backend.app.main:app`."""
+    workers = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    uvicorn.run(
+        "backend.app.main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        # uvloop does not support Windows; fall back to the asyncio loop there
+        loop="uvloop" if os.name != "nt" else "asyncio",
+        http="httptools",
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
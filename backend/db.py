@@ -1,27 +1,85 @@
-import json
+import functools
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-# Allow overriding the DB file used by the application (useful for tests)
-DB_PATH = Path(
-    os.environ.get('ECOLANG_DB_PATH') or Path(__file__).parent / 'ecolang.db'
+import orjson
+
+# Allow overriding the DB file used by the application (useful for tests).
+# The plain string form is computed once and handed to sqlite3.connect.
+_DB_STR = os.environ.get('ECOLANG_DB_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'ecolang.db'
 )
+DB_PATH = Path(_DB_STR)
 
 
-def get_conn():
-    """Return a new sqlite3 connection configured to return rows as dict-like objects.
+# One persistent connection per thread. It is opened lazily by `get_conn()`
+# and never closed by the helpers, so the hot `/run` path pays no
+# connect/close cost per request. Connections are not shared between threads:
+# a reader on one thread must never run inside another thread's open
+# transaction and see rows that may still be rolled back.
+_LOCAL = threading.local()
+# Writers in this process queue here instead of contending for SQLite's
+# write lock and spinning on SQLITE_BUSY.
+_WRITE_LOCK = threading.RLock()
 
-    We create a fresh connection per-call. For the small scale of this project
-    this simple approach is fine; if the app required high concurrency we would
-    switch to a connection pool or an async driver.
-    """
-    conn = sqlite3.connect(str(DB_PATH))
+
+def _open_conn(check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a connection and apply the per-connection PRAGMAs once."""
+    conn = sqlite3.connect(
+        _DB_STR, check_same_thread=check_same_thread, isolation_level=None
+    )
     conn.row_factory = sqlite3.Row
+    # WAL turns each commit into a single log append and lets readers proceed
+    # while a write is in flight; NORMAL sync is durable enough under WAL.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    """Return the calling thread's sqlite3 connection, opening it on first use.
+
+    Rows are returned as dict-like `sqlite3.Row` objects. The connection runs
+    in autocommit mode, so reads only ever see committed data; use
+    `_transaction()` to group several writes.
+    """
+    conn = getattr(_LOCAL, 'conn', None)
+    if conn is None:
+        conn = _LOCAL.conn = _open_conn()
     return conn
 
 
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Cursor]:
+    """Run the enclosed writes as one atomic transaction on this thread's connection."""
+    conn = get_conn()
+    with _WRITE_LOCK:
+        cur = conn.cursor()
+        # take the write lock up front so a concurrent writer in another
+        # process waits on busy_timeout instead of failing the lock upgrade
+        cur.execute('BEGIN IMMEDIATE')
+        try:
+            yield cur
+        except BaseException:
+            cur.execute('ROLLBACK')
+            raise
+        cur.execute('COMMIT')
+
+
+def _inserted_id(cur: sqlite3.Cursor) -> int:
+    """Return the rowid of the INSERT just executed on `cur`."""
+    row_id = cur.lastrowid
+    # sqlite3 sets lastrowid on every successful INSERT
+    assert row_id is not None
+    return row_id
+
+
 def init_db():
     """Ensure the database file and required tables exist.
 
@@ -29,8 +87,12 @@ def init_db():
     simple tables for users, scripts and runs used by the API and tests.
     """
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = get_conn()
-    cur = conn.cursor()
+    with _transaction() as cur:
+        _create_tables(cur)
+
+
+def _create_tables(cur: sqlite3.Cursor) -> None:
+    """Create the Users/Scripts/Runs tables and their indexes if they are missing."""
     cur.execute('''
     CREATE TABLE IF NOT EXISTS Users (
       user_id INTEGER PRIMARY KEY,
@@ -61,31 +123,44 @@ def init_db():
       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
-    conn.commit()
-    conn.close()
+    # Serve the per-user /scripts listing and the per-script /stats history
+    # (newest first, run_id breaking created_at ties) straight from an index,
+    # without a scan + sort. Indexes from earlier versions that did not match
+    # those orders are dropped.
+    cur.execute('DROP INDEX IF EXISTS idx_runs_script_created')
+    cur.execute('DROP INDEX IF EXISTS idx_scripts_created')
+    cur.execute(
+        'CREATE INDEX IF NOT EXISTS idx_runs_script_created_id'
+        ' ON Runs(script_id, created_at DESC, run_id DESC)'
+    )
+    cur.execute(
+        'CREATE INDEX IF NOT EXISTS idx_scripts_user_created'
+        ' ON Scripts(user_id, created_at DESC)'
+    )
+    # Unfiltered run history in the same order, so each `iter_runs` keyset
+    # page is an index range read rather than a re-scan and re-sort.
+    cur.execute(
+        'CREATE INDEX IF NOT EXISTS idx_runs_created_id'
+        ' ON Runs(created_at DESC, run_id DESC)'
+    )
 
 
 def create_user(username: str, password_hash: str) -> int:
     """Create a new user and return its user_id."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        'INSERT INTO Users (username, password_hash) VALUES (?, ?)',
-        (username, password_hash),
-    )
-    user_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+    with _transaction() as cur:
+        cur.execute(
+            'INSERT INTO Users (username, password_hash) VALUES (?, ?)',
+            (username, password_hash),
+        )
+        user_id = _inserted_id(cur)
     return user_id
 
 
 def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
     """Fetch a user row by username, or None if not found."""
-    conn = get_conn()
-    cur = conn.cursor()
+    cur = get_conn().cursor()
     cur.execute('SELECT user_id, username, password_hash, created_at FROM Users WHERE username = ?', (username,))
     row = cur.fetchone()
-    conn.close()
     return dict(row) if row else None
 
 
@@ -98,55 +173,161 @@ def save_script(
     """Persist a script and optionally an initial run's eco-stats.
 
     Returns the new script_id. If `eco_stats` is provided we persist a
-    corresponding run row after creating the script.
+    corresponding run row in the same transaction as the script.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        'INSERT INTO Scripts (user_id, title, code_text) VALUES (?, ?, ?)',
-        (user_id, title, code_text),
-    )
-    script_id = cur.lastrowid
-    conn.commit()
-    conn.close()
-    # optionally save a first run entry if eco_stats provided
-    if eco_stats:
-        save_run(
-            script_id,
-            eco_stats.get("energy_J"),
-            eco_stats.get("energy_kWh"),
-            eco_stats.get("co2_g"),
-            eco_stats.get("total_ops"),
-            eco_stats.get("duration_ms"),
-            eco_stats.get("tips"),
+    with _transaction() as cur:
+        cur.execute(
+            'INSERT INTO Scripts (user_id, title, code_text) VALUES (?, ?, ?)',
+            (user_id, title, code_text),
         )
+        script_id = _inserted_id(cur)
+        # optionally save a first run entry if eco_stats provided
+        if eco_stats:
+            _insert_run(
+                cur,
+                script_id,
+                eco_stats.get("energy_J"),
+                eco_stats.get("energy_kWh"),
+                eco_stats.get("co2_g"),
+                eco_stats.get("total_ops"),
+                eco_stats.get("duration_ms"),
+                eco_stats.get("tips"),
+            )
+    _invalidate_script_caches()
     return script_id
 
 
+# Scripts are immutable once saved (there is no update API), so reads are
+# served from memory. Single scripts live in an LRU; listings are reused for
+# up to _LIST_TTL_S seconds. Both are cleared by `save_script` after its
+# transaction commits, and both are only filled from committed state: never
+# from inside the calling thread's own open transaction, and a listing read
+# that overlapped an invalidation is returned but not stored. Other worker
+# processes keep their own caches, so listings may lag by up to the TTL.
+_LIST_TTL_S = 1.0
+_LIST_CACHE: Dict[Optional[int], Tuple[float, List[Dict[str, Any]]]] = {}
+_LIST_CACHE_LOCK = threading.Lock()
+# Bumped on every invalidation (under _LIST_CACHE_LOCK)
+_CACHE_GEN = 0
+
+
+def _invalidate_script_caches() -> None:
+    global _CACHE_GEN
+    with _LIST_CACHE_LOCK:
+        _CACHE_GEN += 1
+        _LIST_CACHE.clear()
+    _get_script_row.cache_clear()
+
+
 def list_scripts(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """Return a list of saved scripts for a user (or all if user_id is None)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    if user_id is None:
-        cur.execute('SELECT script_id, title, created_at FROM Scripts ORDER BY created_at DESC')
-    else:
-        cur.execute('SELECT script_id, title, created_at FROM Scripts WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    now = time.monotonic()
+    with _LIST_CACHE_LOCK:
+        hit = _LIST_CACHE.get(user_id)
+        gen = _CACHE_GEN
+    if hit is None or now - hit[0] > _LIST_TTL_S:
+        conn = get_conn()
+        cur = conn.cursor()
+        if user_id is None:
+            cur.execute(
+                'SELECT script_id, title, created_at FROM Scripts'
+                ' ORDER BY created_at DESC'
+            )
+        else:
+            cur.execute(
+                'SELECT script_id, title, created_at FROM Scripts WHERE user_id = ?'
+                ' ORDER BY created_at DESC',
+                (user_id,),
+            )
+        hit = (now, [dict(r) for r in cur.fetchall()])
+        if not conn.in_transaction:
+            with _LIST_CACHE_LOCK:
+                if gen == _CACHE_GEN:
+                    _LIST_CACHE[user_id] = hit
+    # hand out copies so callers cannot mutate the cached rows
+    return [dict(r) for r in hit[1]]
+
+
+def _fetch_script_row(conn: sqlite3.Connection, script_id: int) -> Dict[str, Any]:
+    # Raise for missing ids: exceptions are not cached, so a script saved
+    # later (possibly by another process) is found on the next lookup.
+    row = conn.execute(
+        'SELECT script_id, user_id, title, code_text, created_at'
+        ' FROM Scripts WHERE script_id = ?',
+        (script_id,),
+    ).fetchone()
+    if row is None:
+        raise LookupError(script_id)
+    return dict(row)
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_script_row(script_id: int) -> Dict[str, Any]:
+    return _fetch_script_row(get_conn(), script_id)
 
 
 def get_script(script_id: int) -> Optional[Dict[str, Any]]:
     """Fetch a single script by id, returning None if not found."""
     conn = get_conn()
-    cur = conn.cursor()
+    try:
+        if conn.in_transaction:
+            # may see this thread's uncommitted writes: bypass the cache
+            return _fetch_script_row(conn, script_id)
+        return dict(_get_script_row(script_id))
+    except LookupError:
+        return None
+
+
+# Kept as a single constant so sqlite3's per-connection statement cache (keyed
+# by SQL text) compiles the INSERT once for the lifetime of each thread's
+# connection; `save_runs_bulk` binds the same prepared statement per row.
+_INSERT_RUN_SQL = """
+    INSERT INTO Runs (
+        script_id, energy_J, energy_kWh, co2_g, total_ops,
+        duration_ms, tips
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _run_params(
+    script_id: Optional[int],
+    energy_J: Optional[float],
+    energy_kWh: Optional[float],
+    co2_g: Optional[float],
+    total_ops: Optional[int],
+    duration_ms: Optional[int],
+    tips: Optional[List[str]] = None,
+) -> tuple:
+    """Build the bound-parameter tuple for `_INSERT_RUN_SQL`."""
+    tips_json = orjson.dumps(tips or []).decode()
+    return (
+        script_id,
+        energy_J,
+        energy_kWh,
+        co2_g,
+        total_ops,
+        duration_ms,
+        tips_json,
+    )
+
+
+def _insert_run(
+    cur: sqlite3.Cursor,
+    script_id: Optional[int],
+    energy_J: Optional[float],
+    energy_kWh: Optional[float],
+    co2_g: Optional[float],
+    total_ops: Optional[int],
+    duration_ms: Optional[int],
+    tips: Optional[List[str]],
+) -> int:
     cur.execute(
-        'SELECT script_id, user_id, title, code_text, created_at FROM Scripts WHERE script_id = ?',
-        (script_id,),
+        _INSERT_RUN_SQL,
+        _run_params(
+            script_id, energy_J, energy_kWh, co2_g, total_ops, duration_ms, tips
+        ),
     )
-    row = cur.fetchone()
-    conn.close()
-    return dict(row) if row else None
+    return _inserted_id(cur)
 
 
 def save_run(
@@ -160,68 +341,127 @@ def save_run(
 ) -> int:
     """Persist a run row and return its run_id.
 
-    The `tips` argument (if provided) is JSON-serialized into the `tips` TEXT
-    column. Callers should treat this operation as non-fatal for UX: if saving
-    fails, the API should still return the interpreter result.
+    The `tips` argument (if provided) is JSON-serialized (via orjson) into the
+    `tips` TEXT column. Callers should treat this operation as non-fatal for
+    UX: if saving fails, the API should still return the interpreter result.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    tips_json = json.dumps(tips or [])
-    cur.execute(
-        """
-        INSERT INTO Runs (
-            script_id, energy_J, energy_kWh, co2_g, total_ops,
-            duration_ms, tips
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            script_id,
-            energy_J,
-            energy_kWh,
-            co2_g,
-            total_ops,
-            duration_ms,
-            tips_json,
-        ),
-    )
-    run_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+    with _transaction() as cur:
+        run_id = _insert_run(
+            cur, script_id, energy_J, energy_kWh, co2_g, total_ops, duration_ms, tips
+        )
     return run_id
 
 
+def save_runs_bulk(rows: Iterable[Sequence[Any]]) -> int:
+    """Persist many run rows in one transaction and return how many were written.
+
+    Each row carries the positional arguments of `save_run` (`script_id`,
+    `energy_J`, `energy_kWh`, `co2_g`, `total_ops`, `duration_ms` and an
+    optional `tips` list). `executemany` binds the prepared INSERT once and
+    loops over the rows inside SQLite.
+    """
+    params = [_run_params(*row) for row in rows]
+    if not params:
+        return 0
+    with _transaction() as cur:
+        cur.executemany(_INSERT_RUN_SQL, params)
+    return len(params)
+
+
+# Newest first; run_id breaks created_at ties (second resolution) so the
+# order is total and `iter_runs` can page by (created_at, run_id).
+_SELECT_RUNS = (
+    "SELECT run_id, script_id, energy_kWh, co2_g, total_ops,"
+    " duration_ms, tips, created_at FROM Runs"
+)
+_RUNS_ORDER = " ORDER BY created_at DESC, run_id DESC"
+# Rows read per query by `iter_runs`
+_RUNS_PAGE = 500
+
+
+def _runs_query(
+    script_id: Optional[int],
+    after: Optional[Tuple[Any, int]] = None,
+    limit: Optional[int] = None,
+    same_time: bool = False,
+) -> Tuple[str, List[Any]]:
+    """Build the SELECT (and its parameters) behind `list_runs` and `iter_runs`.
+
+    With `after` = (created_at, run_id) the query continues past that row:
+    `same_time` selects the rest of its created_at tie group, otherwise the
+    strictly older rows. Each half is a plain range on the run indexes; a
+    single `(created_at, run_id) < (?, ?)` only seeks on created_at and
+    re-reads the whole tie group for every page.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    if script_id:
+        clauses.append("script_id = ?")
+        params.append(script_id)
+    if after is not None and same_time:
+        clauses.append("created_at = ? AND run_id < ?")
+        params.extend(after)
+    elif after is not None:
+        clauses.append("created_at < ?")
+        params.append(after[0])
+    sql = _SELECT_RUNS
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += _RUNS_ORDER
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def _run_row(r: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a Runs row to a dict with `tips` parsed as a Python list."""
+    d = dict(r)
+    try:
+        d['tips'] = orjson.loads(d.get('tips') or '[]')
+    except Exception:
+        # tolerate corrupt JSON in the DB by returning an empty list
+        d['tips'] = []
+    return d
+
+
+def iter_runs(script_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield run rows one page at a time, optionally filtering by script_id.
+
+    The iterator reads through a connection of its own, `_RUNS_PAGE` rows per
+    query, continuing after the last (created_at, run_id) seen. Each page is
+    a short, complete read, so a slow consumer (e.g. a streaming response
+    resumed on different threadpool threads) neither holds a read snapshot
+    open between pages nor touches any thread's shared connection. Each
+    yielded dict has parsed `tips` as a Python list.
+    """
+    conn = _open_conn(check_same_thread=False)
+
+    def page(after: Optional[Tuple[Any, int]], limit: int, same_time: bool):
+        sql, params = _runs_query(script_id, after, limit, same_time)
+        return conn.execute(sql, params).fetchall()
+
+    try:
+        rows = page(None, _RUNS_PAGE, False)
+        while True:
+            for r in rows:
+                yield _run_row(r)
+            if len(rows) < _RUNS_PAGE:
+                return
+            after = (rows[-1]['created_at'], rows[-1]['run_id'])
+            # finish the last row's created_at tie group, then move on to
+            # older rows
+            rows = page(after, _RUNS_PAGE, True)
+            if len(rows) < _RUNS_PAGE:
+                rows += page(after, _RUNS_PAGE - len(rows), False)
+    finally:
+        conn.close()
+
+
 def list_runs(script_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """List run rows, optionally filtering by script_id.
 
     Each returned dict has parsed `tips` as a Python list.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    if script_id:
-        cur.execute(
-            (
-                "SELECT run_id, script_id, energy_kWh, co2_g, total_ops,"
-                " duration_ms, tips, created_at FROM Runs WHERE script_id = ?"
-                " ORDER BY created_at DESC"
-            ),
-            (script_id,),
-        )
-    else:
-        cur.execute(
-            (
-                "SELECT run_id, script_id, energy_kWh, co2_g, total_ops,"
-                " duration_ms, tips, created_at FROM Runs ORDER BY created_at DESC"
-            )
-        )
-    rows = cur.fetchall()
-    conn.close()
-    out = []
-    for r in rows:
-        d = dict(r)
-        try:
-            d['tips'] = json.loads(d.get('tips') or '[]')
-        except Exception:
-            # tolerate corrupt JSON in the DB by returning an empty list
-            d['tips'] = []
-        out.append(d)
-    return out
+    sql, params = _runs_query(script_id)
+    return [_run_row(r) for r in get_conn().execute(sql, params).fetchall()]
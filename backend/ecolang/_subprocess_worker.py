@@ -3,7 +3,9 @@
 This script is intended to be executed as a short-lived subprocess. It reads
 a single JSON object from stdin with shape {"code": "..."}, attempts to
 execute the code in a deliberately minimal namespace, and writes a JSON
-response to stdout with shape {"result": ..., "error": ...}.
+response to stdout with shape {"result": ..., "error": ...}. When started with
+`--serve` it instead stays alive and answers one such request per stdin line
+(newline-delimited JSON), which lets the parent reuse a single process.
 
 Security and limitations:
   - This is a very small, conservative sandbox. It disallows many AST node
@@ -15,17 +17,56 @@ Security and limitations:
 """
 
 import ast
+import functools
 import json
+import math
 import sys
+from types import CodeType
 from typing import Any, Dict, Optional, Tuple
 
+import orjson
 
-def safe_exec(code_str: str) -> Tuple[Optional[Any], Optional[str]]:
-    """Parse and execute code with a tiny AST-based whitelist.
+# Node types and names we consider unsafe for this tiny sandbox. This is a
+# blunt instrument: keep the sets minimal and easy to understand. Membership
+# is tested with `type(node) in ...`, a single hash lookup per node.
+_BAD_TYPES = frozenset({
+    ast.Import,
+    ast.ImportFrom,
+    ast.Attribute,
+    ast.Call,
+    ast.Subscript,
+    ast.Lambda,
+    ast.FunctionDef,
+    ast.ClassDef,
+})
+_BAD_NAMES = frozenset({"__import__", "eval", "exec", "open", "os", "sys"})
 
-    Returns (result, error_str). `result` is taken from a `result` name in the
-    executed locals if present. `error_str` is None on success or a short
-    textual description on failure.
+
+class _Rejected(Exception):
+    """Raised by `_Validator` on the first disallowed node to stop the walk early."""
+
+
+class _Validator(ast.NodeVisitor):
+    """Single-pass whitelist check that bails out on the first violation."""
+
+    def generic_visit(self, node):
+        if type(node) in _BAD_TYPES:
+            raise _Rejected(f'{type(node).__name__} not allowed')
+        super().generic_visit(node)
+
+    def visit_Name(self, node):
+        # Disallow direct use of dangerous builtins or names
+        if node.id in _BAD_NAMES:
+            raise _Rejected(f'name {node.id} not allowed')
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_and_check(code_str: str) -> Tuple[Optional[CodeType], Optional[str]]:
+    """Parse, validate and compile `code_str`, memoized per source text.
+
+    Returns (code, None) on success or (None, error_str) on rejection; both
+    outcomes are cached, so a persistent worker handling repeated submissions
+    skips the parse, AST walk and compile entirely.
     """
     # Parse once and reject parse errors early
     try:
@@ -33,40 +74,125 @@ def safe_exec(code_str: str) -> Tuple[Optional[Any], Optional[str]]:
     except Exception as e:
         return None, f'parse_error: {e}'
 
-    # Disallow nodes we consider unsafe for this tiny sandbox. This is a blunt
-    # instrument: keep the list minimal and easy to understand.
-    for n in ast.walk(node):
-        if isinstance(n, (ast.Import, ast.ImportFrom, ast.Attribute, ast.Call, ast.Subscript, ast.Lambda, ast.FunctionDef, ast.ClassDef)):
-            return None, f'{type(n).__name__} not allowed'
-        # Disallow direct use of dangerous builtins or names
-        if isinstance(n, ast.Name) and n.id in ("__import__", "eval", "exec", "open", "os", "sys"):
-            return None, f'name {n.id} not allowed'
+    try:
+        _Validator().visit(node)
+    except _Rejected as e:
+        return None, str(e)
+
+    try:
+        return compile(node, '<string>', 'exec'), None
+    except Exception as e:
+        return None, f'parse_error: {e}'
+
+
+def safe_exec(code_str: str) -> Tuple[Optional[Any], Optional[str]]:
+    """Parse and execute code with a tiny AST-based whitelist.
+
+    Returns (result, error_str). `result` is taken from a `result` name in the
+    executed locals if present. `error_str` is None on success or a short
+    textual description on failure.
+    """
+    code, error = _compile_and_check(code_str)
+    if code is None:
+        return None, error
 
     # Minimal globals: no builtins provided. The caller must ensure this worker
     # is invoked in a controlled environment with external timeouts.
     g: Dict[str, Any] = {"__builtins__": {}}
     local_ns: Dict[str, Any] = {}
     try:
-        exec(compile(node, '<string>', 'exec'), g, local_ns)
+        exec(code, g, local_ns)
         # If the executed code set a `result` variable we return it
         return local_ns.get('result', None), None
     except Exception as e:
         return None, f'error: {e}'
 
 
+def _encode_response(res: Any, err: Optional[str]) -> bytes:
+    """Serialize a worker response, reporting values JSON cannot encode.
+
+    orjson handles the common case; values it rejects but the stdlib encoder
+    accepts (e.g. ints wider than 64 bits) fall back to `json.dumps`.
+    """
+    response = {'result': res, 'error': err}
+    try:
+        return orjson.dumps(response)
+    except orjson.JSONEncodeError:
+        pass
+    try:
+        return json.dumps(response).encode()
+    except (TypeError, ValueError) as e:
+        return orjson.dumps({'result': None, 'error': f'unserializable_result: {e}'})
+
+
 def main() -> None:
-    raw = sys.stdin.read()
+    # Read raw bytes and let orjson decode UTF-8 directly, skipping the text
+    # layer's locale decode and an extra copy of the payload.
+    raw = sys.stdin.buffer.read()
     try:
-        payload = json.loads(raw)
+        payload = orjson.loads(raw)
         code = payload.get('code', '')
     except Exception as e:
         # Communicate payload decoding errors via JSON to the parent process
-        print(json.dumps({'result': None, 'error': f'bad_payload: {e}'}))
+        error = {'result': None, 'error': f'bad_payload: {e}'}
+        sys.stdout.buffer.write(orjson.dumps(error))
+        sys.stdout.buffer.flush()
         sys.exit(1)
 
     res, err = safe_exec(code)
-    print(json.dumps({'result': res, 'error': err}))
+    sys.stdout.buffer.write(_encode_response(res, err))
+    sys.stdout.buffer.flush()
+
+
+def _renew_cpu_budget(cpu_seconds: int) -> None:
+    """Move the soft RLIMIT_CPU to `cpu_seconds` past the CPU time used so far.
+
+    RLIMIT_CPU counts the whole process lifetime, so a persistent worker
+    renews it before each request; a request that exhausts its budget gets
+    the worker terminated by SIGXCPU. A no-op where `resource` is missing.
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def serve(cpu_seconds: Optional[int] = None) -> None:
+    """Persistent mode: answer one newline-delimited JSON request per line.
+
+    Used by `subprocess_runner.PersistentWorker` so the interpreter start-up
+    cost is paid once per worker instead of once per call. A malformed request
+    is answered with a `bad_payload` error and the loop keeps serving. With
+    `cpu_seconds` set, each request gets that much CPU time.
+    """
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    res: Any
+    err: Optional[str]
+    for raw in stdin:
+        if cpu_seconds is not None:
+            _renew_cpu_budget(cpu_seconds)
+        try:
+            payload = orjson.loads(raw)
+            code = payload.get('code', '')
+        except Exception as e:
+            res, err = None, f'bad_payload: {e}'
+        else:
+            res, err = safe_exec(code)
+        stdout.write(_encode_response(res, err) + b'\n')
+        stdout.flush()
 
 
 if __name__ == '__main__':
-    main()
+    if '--serve' in sys.argv[1:]:
+        flag = '--cpu-seconds='
+        cpu = [a[len(flag):] for a in sys.argv[1:] if a.startswith(flag)]
+        serve(int(cpu[0]) if cpu else None)
+    else:
+        main()
@@ -14,9 +14,16 @@ this file explain the expected inputs, outputs and error behaviours.
 """
 
 import ast
+import functools
+import io
 import json
+import operator
+import re
+import sys
 import time
-from typing import Any, Dict, List, Optional, Tuple
+import types
+from array import array
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
 
 from . import subprocess_runner
 
@@ -41,6 +48,112 @@ class EvalError(Exception):
 
 
 
+def _fn_len(*args):
+    if len(args) != 1:
+        raise EvalError("length expects 1 arg")
+    return len(args[0])
+
+
+def _fn_to_number(*args):
+    if len(args) != 1:
+        raise EvalError("toNumber expects 1 arg")
+    try:
+        return float(args[0]) if (isinstance(args[0], str) and ("." in args[0])) else int(args[0])
+    except Exception as e:
+        raise EvalError("toNumber failed") from e
+
+
+def _fn_to_string(*args):
+    if len(args) != 1:
+        raise EvalError("toString expects 1 arg")
+    return str(args[0])
+
+
+def _fn_array(*args):
+    if args:
+        raise EvalError("array expects 0 args")
+    return []
+
+
+def _fn_append(*args):
+    if len(args) != 2:
+        raise EvalError("append expects 2 args")
+    # functional append: returns a new array
+    if not isinstance(args[0], list):
+        raise EvalError("append first arg must be array")
+    arr = list(args[0])
+    arr.append(args[1])
+    return arr
+
+
+def _fn_at(*args):
+    if len(args) != 2:
+        raise EvalError("at expects 2 args")
+    a, idx = args
+    if not isinstance(a, list):
+        raise EvalError("at first arg must be array")
+    try:
+        return a[int(idx)]
+    except Exception as e:
+        raise EvalError("index out of range") from e
+
+
+def _fn_eco_ops(ops, *_args):
+    # `ops` is the `_eco_ops` value injected into the env by the interpreter
+    return int(ops)
+
+
+def _fn_add(left, right):
+    # Support string concatenation by coercing to string when either side is a string
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+
+def _fn_pow(left, right):
+    # Guard against huge exponents
+    if abs(right) > 8:
+        raise EvalError("Exponent too large; max 8")
+    return left ** right
+
+
+# Builtin EcoLang functions (`ecoOps` is special-cased: it reads the env)
+_CALL_HELPERS = {
+    "len": _fn_len,
+    "length": _fn_len,
+    "toNumber": _fn_to_number,
+    "toString": _fn_to_string,
+    "array": _fn_array,
+    "append": _fn_append,
+    "at": _fn_at,
+}
+
+# Operator tables keyed by AST op type; shared by SafeEvaluator and the
+# allowlist check in `_compile_expr`.
+_BINOPS = {
+    ast.Add: _fn_add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: _fn_pow,
+}
+_CMPOPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_UNARYOPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: operator.not_,
+}
+
+
 class SafeEvaluator(ast.NodeVisitor):
     """Minimal AST evaluator for simple expressions used by EcoLang.
 
@@ -61,29 +174,10 @@ class SafeEvaluator(ast.NodeVisitor):
         return self.visit(node.body)
 
     def visit_BinOp(self, node):
-        left = self.visit(node.left)
-        right = self.visit(node.right)
-        if isinstance(node.op, ast.Add):
-            # Support string concatenation by coercing to string when either side is a string
-            if isinstance(left, str) or isinstance(right, str):
-                return str(left) + str(right)
-            return left + right
-        if isinstance(node.op, ast.Sub):
-            return left - right
-        if isinstance(node.op, ast.Mult):
-            return left * right
-        if isinstance(node.op, ast.Div):
-            return left / right
-        if isinstance(node.op, ast.Mod):
-            return left % right
-        if isinstance(node.op, ast.FloorDiv):
-            return left // right
-        if isinstance(node.op, ast.Pow):
-            # Guard against huge exponents
-            if abs(right) > 8:
-                raise EvalError("Exponent too large; max 8")
-            return left ** right
-        raise EvalError(f"Unsupported binary op {node.op}")
+        op = _BINOPS.get(type(node.op))
+        if op is None:
+            raise EvalError(f"Unsupported binary op {node.op}")
+        return op(self.visit(node.left), self.visit(node.right))
 
     def visit_Compare(self, node):
         # support simple comparisons: left <op> right (single comparator)
@@ -91,39 +185,27 @@ class SafeEvaluator(ast.NodeVisitor):
             raise EvalError("Chained comparisons not supported")
         left = self.visit(node.left)
         right = self.visit(node.comparators[0])
-        op = node.ops[0]
-        if isinstance(op, ast.Eq):
-            return left == right
-        if isinstance(op, ast.NotEq):
-            return left != right
-        if isinstance(op, ast.Lt):
-            return left < right
-        if isinstance(op, ast.LtE):
-            return left <= right
-        if isinstance(op, ast.Gt):
-            return left > right
-        if isinstance(op, ast.GtE):
-            return left >= right
-        raise EvalError(f"Unsupported comparison {type(op).__name__}")
+        op = _CMPOPS.get(type(node.ops[0]))
+        if op is None:
+            raise EvalError(f"Unsupported comparison {type(node.ops[0]).__name__}")
+        return op(left, right)
 
     def visit_UnaryOp(self, node):
         operand = self.visit(node.operand)
-        if isinstance(node.op, ast.UAdd):
-            return +operand
-        if isinstance(node.op, ast.USub):
-            return -operand
-        if isinstance(node.op, ast.Not):
-            return not operand
-        raise EvalError("Unsupported unary op")
+        op = _UNARYOPS.get(type(node.op))
+        if op is None:
+            raise EvalError("Unsupported unary op")
+        return op(operand)
 
     def visit_BoolOp(self, node):
         # Implement short-circuit and/or
-        if isinstance(node.op, ast.And):
+        op = type(node.op)
+        if op is ast.And:
             for v in node.values:
                 if not self.visit(v):
                     return False
             return True
-        if isinstance(node.op, ast.Or):
+        if op is ast.Or:
             for v in node.values:
                 if self.visit(v):
                     return True
@@ -148,68 +230,289 @@ class SafeEvaluator(ast.NodeVisitor):
     def visit_Call(self, node):
         # Allow a limited set of safe builtin calls: len/length, toNumber, toString,
         # array(), append(a,x), at(a,i), ecoOps()
-        if not isinstance(node.func, ast.Name):
+        if type(node.func) is not ast.Name:
             raise EvalError("Unsupported call target")
         name = node.func.id
         # Evaluate arguments first
         args = [self.visit(a) for a in node.args]
-        if name in ("len", "length"):
-            if len(args) != 1:
-                raise EvalError("length expects 1 arg")
-            return len(args[0])
-        if name == "toNumber":
-            if len(args) != 1:
-                raise EvalError("toNumber expects 1 arg")
-            try:
-                return float(args[0]) if (isinstance(args[0], str) and ("." in args[0])) else int(args[0])
-            except Exception:
-                raise EvalError("toNumber failed")
-        if name == "toString":
-            if len(args) != 1:
-                raise EvalError("toString expects 1 arg")
-            return str(args[0])
-        if name == "array":
-            if args:
-                raise EvalError("array expects 0 args")
-            return []
-        if name == "append":
-            if len(args) != 2:
-                raise EvalError("append expects 2 args")
-            # functional append: returns a new array
-            if not isinstance(args[0], list):
-                raise EvalError("append first arg must be array")
-            arr = list(args[0])
-            arr.append(args[1])
-            return arr
-        if name == "at":
-            if len(args) != 2:
-                raise EvalError("at expects 2 args")
-            a, idx = args
-            if not isinstance(a, list):
-                raise EvalError("at first arg must be array")
-            try:
-                return a[int(idx)]
-            except Exception:
-                raise EvalError("index out of range")
+        helper = _CALL_HELPERS.get(name)
+        if helper is not None:
+            return helper(*args)
         if name == "ecoOps":
             # returns current ops from env injection
-            return int(self.env.get("_eco_ops", 0))
+            return _fn_eco_ops(self.env.get("_eco_ops", 0))
         raise EvalError("Unsupported function call")
 
     def generic_visit(self, node):
         raise EvalError(f"Unsupported expression: {type(node).__name__}")
 
 
+_ALLOWED_CALLS = frozenset(_CALL_HELPERS) | {"ecoOps"}
+
+
+class _Lowering(ast.NodeTransformer):
+    """Rewrite a validated tree so CPython's semantics match EcoLang's.
+
+    `+` (string coercion) and `**` (exponent guard) become helper calls,
+    boolean operators are wrapped in `bool()` (EcoLang yields true/false, not
+    the operand), and builtin calls are pointed at `__eco_*` globals that user
+    code cannot name.
+    """
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if type(node.left) is ast.Constant and type(node.right) is ast.Constant:
+            # literal subtree of a larger expression (`x * (60 + 5)`); once
+            # lowered to a helper call CPython could no longer fold it
+            folded = _fold_binop(node)
+            if folded is not None:
+                return folded
+        if isinstance(node.op, ast.Add):
+            helper = "__eco_add"
+        elif isinstance(node.op, ast.Pow):
+            helper = "__eco_pow"
+        else:
+            return node
+        return ast.copy_location(
+            ast.Call(
+                func=ast.Name(id=helper, ctx=ast.Load()),
+                args=[node.left, node.right],
+                keywords=[],
+            ),
+            node,
+        )
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return ast.copy_location(
+            ast.Call(
+                func=ast.Name(id="__eco_bool", ctx=ast.Load()), args=[node], keywords=[]
+            ),
+            node,
+        )
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = node.func.id
+        if name == "ecoOps":
+            node.args = [ast.Name(id="_eco_ops", ctx=ast.Load())] + node.args
+        node.func = ast.copy_location(
+            ast.Name(id=f"__eco_{name}", ctx=ast.Load()), node.func
+        )
+        return node
+
+
+# Globals for compiled expressions. No builtins are reachable; env names
+# shadow these (locals are looked up first), which keeps `true`/`false`
+# overridable and `_eco_ops` defaulting to 0 like `SafeEvaluator`.
+_EVAL_GLOBALS: Dict[str, Any] = {
+    "__builtins__": {},
+    "true": True,
+    "false": False,
+    "_eco_ops": 0,
+    "__eco_add": _fn_add,
+    "__eco_pow": _fn_pow,
+    "__eco_bool": bool,
+    "__eco_ecoOps": _fn_eco_ops,
+    **{f"__eco_{name}": fn for name, fn in _CALL_HELPERS.items()},
+}
+
+
+_DISALLOWED = frozenset(
+    {
+        ast.Attribute,
+        ast.Import,
+        ast.ImportFrom,
+        ast.Lambda,
+        ast.DictComp,
+        ast.ListComp,
+        ast.SetComp,
+        ast.GeneratorExp,
+        ast.Yield,
+        ast.YieldFrom,
+        ast.FunctionDef,
+        ast.ClassDef,
+        ast.Subscript,
+        ast.Global,
+        ast.Nonlocal,
+    }
+)
+_DANGEROUS_NAMES = frozenset({"__import__", "eval", "exec", "open", "os", "sys"})
+
+
+def _validate(node: ast.AST) -> None:
+    """Reject dangerous constructs anywhere under `node`, evaluated or not.
+
+    This is the security boundary: it recurses into every child (via
+    `ast.iter_child_nodes`), including operands a short-circuit would skip,
+    and raises EvalError for disallowed node types, calls outside the EcoLang
+    builtins and a few dangerous names. Constructs that are merely
+    unsupported (chained comparisons, `~`, `if`-expressions, ...) pass here
+    and are rejected by `SafeEvaluator` only when reached.
+    """
+    t = type(node)
+    if t in _DISALLOWED:
+        raise EvalError(f"Unsupported expression element: {t.__name__}")
+    # Allow only a safe set of function calls
+    if type(node) is ast.Call:
+        func = node.func
+        if type(func) is not ast.Name or func.id not in _ALLOWED_CALLS:
+            raise EvalError("Unsupported function call")
+    # explicitly disallow a few dangerous builtin names
+    elif type(node) is ast.Name and node.id in _DANGEROUS_NAMES:
+        raise EvalError(f"Unsupported name in expression: {node.id}")
+    for child in ast.iter_child_nodes(node):
+        _validate(child)
+
+
+# Node type -> the operands to check, or None when `SafeEvaluator` would
+# reject or specially treat the node itself (see `_compilable`)
+_COMPILED_OPERANDS = {
+    ast.Expression: lambda n: [n.body],
+    ast.BinOp: lambda n: [n.left, n.right] if type(n.op) in _BINOPS else None,
+    ast.Compare: lambda n: (
+        [n.left, n.comparators[0]]
+        if len(n.ops) == 1 and type(n.ops[0]) in _CMPOPS
+        else None
+    ),
+    ast.UnaryOp: lambda n: [n.operand] if type(n.op) in _UNARYOPS else None,
+    ast.BoolOp: lambda n: n.values,
+    # `SafeEvaluator` ignores keyword arguments; leave those calls to it
+    ast.Call: lambda n: None if n.keywords else n.args,
+}
+
+
+def _compilable(node: ast.AST) -> Optional[bool]:
+    """Classify a validated subtree for `_compile_expr`.
+
+    Returns None when the subtree leaves the subset that compiles to the same
+    semantics as `SafeEvaluator` (anything it rejects or treats specially, and
+    names starting with `__`, which could reach the `__eco_*` helpers or
+    `__builtins__`). Otherwise returns True when the subtree has no names or
+    calls, i.e. it can be folded to a constant.
+    """
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.Name):
+        return None if node.id.startswith("__") else False
+    t = type(node)
+    operands = _COMPILED_OPERANDS.get(t)
+    children = operands(node) if operands is not None else None
+    if children is None:
+        return None
+    constant = t is not ast.Call
+    for child in children:
+        c = _compilable(child)
+        if c is None:
+            return None
+        constant = constant and c
+    return constant
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_expr(expr: str) -> Union[Any, EvalError]:
+    """Parse, validate and compile `expr` once; memoized per expression string.
+
+    Returns `("const", value)` for expressions without names or calls (folded
+    once here), `("name", identifier)` for a bare variable read, `("code",
+    code)` for a code object ready for `eval` with `_EVAL_GLOBALS`, `("tree",
+    tree)` for the rare valid expressions outside the compiled subset (see
+    `_compilable`), evaluated by `SafeEvaluator`, or the `EvalError`
+    describing why the expression was rejected. Rejections are cached too, so
+    loops that keep evaluating a bad expression do not re-parse it;
+    `eval_expr` raises a fresh copy of the cached error each time.
+    """
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        # Hide Python SyntaxError; elevate to EvalError carrying a basic column
+        # and the original expression text for better diagnostics at call sites.
+        col = int(e.offset or 1)
+        return EvalError("Syntax error in expression", column=col, text=expr)
+    except RecursionError:
+        return EvalError("Expression too deeply nested", text=expr)
+
+    # Walk the AST and explicitly disallow dangerous constructs. Doing this
+    # centrally (instead of relying on SafeEvaluator.generic_visit) gives a
+    # clear security boundary and makes approval decisions explicit.
+    try:
+        _validate(tree)
+        constant = _compilable(tree)
+    except EvalError as e:
+        return e
+    except RecursionError:
+        return EvalError("Expression too deeply nested")
+
+    if constant is None:
+        # e.g. `x or 1 < 2 < 3`: the reference evaluator rejects unsupported
+        # constructs only if evaluation reaches them
+        return ("tree", tree)
+    if constant:
+        value = _fold_constant(tree)
+        if value is not _NOT_FOLDED:
+            return ("const", value)
+    if type(tree.body) is ast.Name:
+        # bare variable reads (`say x`, `let y = x`) skip eval entirely
+        return ("name", tree.body.id)
+
+    try:
+        tree = ast.fix_missing_locations(_Lowering().visit(tree))
+        return ("code", compile(tree, "<ecolang-expr>", "eval"))
+    except Exception as e:
+        return EvalError(str(e))
+
+
+_NOT_FOLDED = object()
+# Folded strings are kept in the expression cache; don't pin huge ones.
+_MAX_FOLDED_LEN = 4096
+
+
+def _fold_constant(tree: ast.Expression) -> Any:
+    """Evaluate a name- and call-free tree once with `SafeEvaluator`.
+
+    Returns `_NOT_FOLDED` when evaluation fails (the error is then raised by
+    the compiled code on every evaluation, as before) or the result is large.
+    """
+    try:
+        value = SafeEvaluator({}).visit(tree)
+    except Exception:
+        return _NOT_FOLDED
+    if isinstance(value, (str, bytes)) and len(value) > _MAX_FOLDED_LEN:
+        return _NOT_FOLDED
+    return value
+
+
+def _fold_binop(node: ast.BinOp) -> Optional[ast.Constant]:
+    """Return `node` (two constant operands) evaluated to a Constant, or None.
+
+    As with `_fold_constant`, failures and large results are left to be
+    evaluated (and raise) at run time.
+    """
+    left, right = node.left, node.right
+    if not (isinstance(left, ast.Constant) and isinstance(right, ast.Constant)):
+        return None
+    try:
+        value = _BINOPS[type(node.op)](left.value, right.value)
+    except Exception:
+        return None
+    if isinstance(value, (str, bytes)) and len(value) > _MAX_FOLDED_LEN:
+        return None
+    return ast.copy_location(ast.Constant(value), node)
+
+
 def eval_expr(expr: str, env: Dict[str, Any]):
     """Parse and safely evaluate a single expression string.
 
     This function performs two responsibilities:
-    1. Parse the expression into an AST and validate that no disallowed nodes
+    1. Parse the expression into an AST, validate it against an allowlist
        (calls, attribute access, imports, comprehensions, function/class defs,
-       subscripts, etc.) are present. Rejecting these at the AST level keeps
-       evaluation simple and safe.
-    2. Use the `SafeEvaluator` to compute the value of the expression using a
-       restricted environment `env`.
+       subscripts, etc. are rejected) and compile it, or fold it to a value
+       when it only involves literals. This step is cached per expression
+       string by `_compile_expr`, so loops only pay it once.
+    2. Evaluate the code object with `env` as locals and `_EVAL_GLOBALS`
+       (no builtins, only the EcoLang helpers) as globals.
+
+    `SafeEvaluator` remains the reference implementation of these semantics.
 
     Args:
         expr: expression source text (e.g. "a + 3").
@@ -221,69 +524,486 @@ def eval_expr(expr: str, env: Dict[str, Any]):
     Raises:
         EvalError: if parsing fails or disallowed AST nodes are present.
     """
-    try:
-        tree = ast.parse(expr, mode="eval")
-    except SyntaxError as e:
-        # Hide Python SyntaxError; elevate to EvalError carrying a basic column
-        # and the original expression text for better diagnostics at call sites.
-        col = None
-        try:
-            col = int(getattr(e, "offset", None) or 1)
-        except Exception:
-            col = 1
-        raise EvalError("Syntax error in expression", column=col, text=expr) from e
+    return _eval_compiled(_compile_expr(expr), env)
 
-    # Walk the AST and explicitly disallow dangerous constructs. Doing this
-    # centrally (instead of relying on SafeEvaluator.generic_visit) gives a
-    # clear security boundary and makes approval decisions explicit.
-    for node in ast.walk(tree):
-        if isinstance(
-            node,
-            (
-                ast.Attribute,
-                ast.Import,
-                ast.ImportFrom,
-                ast.Lambda,
-                ast.DictComp,
-                ast.ListComp,
-                ast.SetComp,
-                ast.GeneratorExp,
-                ast.Yield,
-                ast.YieldFrom,
-                ast.FunctionDef,
-                ast.ClassDef,
-                ast.Subscript,
-                ast.Global,
-                ast.Nonlocal,
-            ),
-        ):
-            raise EvalError(f"Unsupported expression element: {type(node).__name__}")
-        # Allow only a safe set of function calls
-        if isinstance(node, ast.Call):
-            if not isinstance(node.func, ast.Name) or node.func.id not in (
-                "len",
-                "length",
-                "toNumber",
-                "toString",
-                "array",
-                "append",
-                "at",
-                "ecoOps",
-            ):
-                raise EvalError("Unsupported function call")
-        # explicitly disallow a few dangerous builtin names
-        if isinstance(node, ast.Name) and node.id in ("__import__", "eval", "exec", "open", "os", "sys"):
-            raise EvalError(f"Unsupported name in expression: {node.id}")
 
-    evaluator = SafeEvaluator(env)
+def _eval_compiled(compiled: Union[Any, EvalError], env: Dict[str, Any]):
+    """Evaluate a `_compile_expr` result against `env`.
+
+    Loops that evaluate the same expression every iteration (a `while`
+    condition) compile it once and call this directly, skipping the cache
+    lookup `eval_expr` does per call.
+    """
+    if isinstance(compiled, EvalError):
+        # raise a fresh copy: re-raising the cached instance would keep
+        # growing its traceback
+        raise EvalError(str(compiled), column=compiled.column, text=compiled.text)
+    kind, code = compiled
+    if kind == "const":
+        return code
+    if kind == "name":
+        # same lookup order as the compiled form: env, then the globals that
+        # provide `true`/`false`/`_eco_ops`
+        try:
+            return env[code]
+        except KeyError:
+            pass
+        try:
+            return _EVAL_GLOBALS[code]
+        except KeyError:
+            raise EvalError(f"Undefined variable '{code}'") from None
+
     try:
-        return evaluator.visit(tree)
+        if kind == "tree":
+            return SafeEvaluator(env).visit(code)
+        return eval(code, _EVAL_GLOBALS, env)
     except EvalError:
         raise
+    except NameError as e:
+        raise EvalError(f"Undefined variable '{e.name}'") from e
     except Exception as e:
         # Convert any unexpected Python errors (TypeError, ZeroDivisionError, etc.)
         # into a friendly EvalError so the interpreter can report them cleanly.
-        raise EvalError(str(e))
+        raise EvalError(str(e)) from e
+
+
+# Block-structure kinds used by the block scanners (see `_structure_kind`).
+# The values are the group numbers of `_STRUCTURE_RE`.
+_K_OTHER, _K_OPEN, _K_FUNC, _K_END, _K_ELSE, _K_ELIF = range(6)
+_STRUCTURE_RE = re.compile(
+    r"(if |repeat |while |for )|(func )|(end\Z)|(else\Z)|(elif (?:.* )?then\Z)", re.S
+)
+# First whitespace-delimited token of a stripped line
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def _structure_kind(line: str) -> int:
+    """Classify a stripped line for block scanning with one regex match.
+
+    `_K_OPEN` is an if/repeat/while/for header, `_K_FUNC` a func header,
+    `_K_ELIF` an `elif ... then` line; `_K_END`/`_K_ELSE` are exact matches.
+    """
+    m = _STRUCTURE_RE.match(line)
+    if m is None or m.lastindex is None:
+        return _K_OTHER
+    return m.lastindex
+
+
+# Statement kinds stored per line in `_Program.kinds` (see `_statement_kind`)
+(
+    _S_BLANK,
+    _S_UNKNOWN,
+    _S_ECOTIP,
+    _S_SAVE_POWER,
+    _S_ELSE,
+    _S_END,
+    _S_SAY,
+    _S_LET,
+    _S_WARN,
+    _S_CONST,
+    _S_ASK,
+    _S_FUNC,
+    _S_CALL,
+    _S_IF,
+    _S_REPEAT,
+    _S_WHILE,
+    _S_FOR,
+    _S_RETURN,
+    _S_COUNT,
+) = range(19)
+
+_STATEMENT_TOKENS = {
+    "savePower": _S_SAVE_POWER,
+    "else": _S_ELSE,
+    "end": _S_END,
+    "say": _S_SAY,
+    "let": _S_LET,
+    "warn": _S_WARN,
+    "const": _S_CONST,
+    "ask": _S_ASK,
+    "func": _S_FUNC,
+    "call": _S_CALL,
+    "if": _S_IF,
+    "repeat": _S_REPEAT,
+    "while": _S_WHILE,
+    "for": _S_FOR,
+    # only meaningful inside a function body; see `_execute_function`
+    "return": _S_RETURN,
+}
+
+
+def _statement_kind(line: str) -> int:
+    """Classify a stripped source line by its leading token."""
+    if not line or line.startswith("#"):
+        return _S_BLANK
+    if line == "ecoTip":
+        return _S_ECOTIP
+    m = _TOKEN_RE.match(line)
+    if m is None:
+        return _S_UNKNOWN
+    return _STATEMENT_TOKENS.get(m.group(), _S_UNKNOWN)
+
+
+# Kinds that bind into the env they run against (`call ... into x` included).
+_ENV_WRITING_KINDS = frozenset(
+    (_S_LET, _S_CONST, _S_ASK, _S_CALL, _S_SAVE_POWER, _S_FOR)
+)
+
+
+# Kinds that make a function body's result depend on more than its args.
+_IMPURE_BODY_KINDS = frozenset((_S_ASK, _S_CALL, _S_FUNC, _S_CONST))
+
+# Argument/return types a memoized call may share between calls (immutable).
+_MEMO_TYPES = frozenset((int, float, str, bool, type(None)))
+# Bound on `Interpreter._call_memo` entries per run.
+_CALL_MEMO_MAX = 1024
+
+
+def _memo_key(values: Any) -> Optional[Tuple[Any, ...]]:
+    """Return a hashable key for call arguments, or None if not memoizable.
+
+    Keys carry the type (`1`, `1.0` and `true` compare equal but print
+    differently) and floats are keyed by repr so `-0.0` and `0.0` differ.
+    """
+    key = []
+    for v in values:
+        t = type(v)
+        if t not in _MEMO_TYPES:
+            return None
+        key.append((t, repr(v) if t is float else v))
+    return tuple(key)
+
+
+# Kinds whose handlers read `state.total_ops`. The run loops charge the
+# per-statement `other` cost as `steps_local * other_cost` and only write the
+# exact running total into the state before dispatching one of these.
+_READS_TOTAL_OPS = tuple(
+    k in (_S_ECOTIP, _S_IF, _S_WHILE, _S_FOR, _S_REPEAT) for k in range(_S_COUNT)
+)
+
+
+class _Program(list):
+    """Source lines plus per-line facts computed once and shared between runs.
+
+    Behaves exactly like the `List[str]` of raw lines the handlers index into
+    (slices are plain lists). Parallel per-line arrays: `stripped` holds each
+    line with surrounding whitespace removed, `kinds` its statement kind
+    (`_S_*`), which drives `_dispatch_statement`, and `structure` its
+    block-structure kind (`_K_*`) for the block scanners.
+
+    Instances are shared across runs and threads via `_compile_program`, so
+    the lines and these arrays are never changed after construction. The
+    underscore slots are caches filled lazily on first use: `_blocks`
+    memoizes `_extract_block_for_run` results by start index and `_if_split`
+    the `_split_if_block` result for an if body; `reads_ops()`,
+    `writes_scale()`, `writes_env()` and `pure_body()` cache whether any line
+    can observe the op counter, change the op scale, bind a variable or reach
+    state outside a function's arguments. Every fill is derived only from the
+    immutable lines, so two threads filling the same entry store equal values
+    and readers never see a partial result.
+    """
+
+    __slots__ = (
+        # fixed at construction
+        "stripped",
+        "kinds",
+        "structure",
+        # lazily filled caches (see above)
+        "_blocks",
+        "_if_split",
+        "_reads_ops",
+        "_writes_scale",
+        "_writes_env",
+        "_pure_body",
+    )
+
+    def __init__(
+        self,
+        lines: List[str],
+        stripped: Optional[List[str]] = None,
+        kinds: Optional[array] = None,
+        structure: Optional[array] = None,
+    ):
+        super().__init__(lines)
+        self.stripped: List[str] = (
+            stripped if stripped is not None else [ln.strip() for ln in lines]
+        )
+        self.kinds: array = (
+            kinds
+            if kinds is not None
+            else array("b", map(_statement_kind, self.stripped))
+        )
+        self.structure: array = (
+            structure
+            if structure is not None
+            else array("b", map(_structure_kind, self.stripped))
+        )
+        self._blocks: Dict[int, Tuple["_Program", int]] = {}
+        self._if_split: Optional[
+            Tuple["_Program", Optional[str], Optional["_Program"], "_Program"]
+        ] = None
+        self._reads_ops: Optional[bool] = None
+        self._writes_scale: Optional[bool] = None
+        self._writes_env: Optional[bool] = None
+        self._pure_body: Optional[bool] = None
+
+    def reads_ops(self) -> bool:
+        """Whether any line mentions `ecoOps` or `_eco_ops`.
+
+        Nested blocks, `if` sub-runs and function bodies are all part of the
+        same text, so when this is False nothing in the run can observe
+        `env["_eco_ops"]`.
+        """
+        if self._reads_ops is None:
+            self._reads_ops = any(
+                "ecoOps" in ln or "_eco_ops" in ln for ln in self.stripped
+            )
+        return self._reads_ops
+
+    def writes_scale(self) -> bool:
+        """Whether any line can change `env["_ops_scale"]`.
+
+        Only `savePower` or a statement naming `_ops_scale` (let/const/ask)
+        can; otherwise the scale stays whatever the run started with.
+        """
+        if self._writes_scale is None:
+            self._writes_scale = any(
+                "savePower" in ln or "_ops_scale" in ln for ln in self.stripped
+            )
+        return self._writes_scale
+
+    def writes_env(self) -> bool:
+        """Whether running these lines at top level can write to its env.
+
+        Nested lines are included (a `while` body binds into the same env),
+        as is the `_eco_ops` sync done for programs that read it.
+        """
+        if self._writes_env is None:
+            self._writes_env = self.reads_ops() or any(
+                k in _ENV_WRITING_KINDS for k in self.kinds
+            )
+        return self._writes_env
+
+    def pure_body(self) -> bool:
+        """Whether these lines, run as a function body, depend only on the args.
+
+        A body runs against an env holding just its arguments, so only `ask`
+        (run inputs), `call` (the function registry), `func` (mutates the
+        registry) and `const` (mutates the interpreter's const set) reach
+        outside it.
+        """
+        if self._pure_body is None:
+            self._pure_body = not any(k in _IMPURE_BODY_KINDS for k in self.kinds)
+        return self._pure_body
+
+    def slice(self, start: int, stop: int) -> "_Program":
+        """Return lines [start, stop) as a `_Program` reusing the computed arrays."""
+        return _Program(
+            self[start:stop],
+            self.stripped[start:stop],
+            self.kinds[start:stop],
+            self.structure[start:stop],
+        )
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_program(code: str) -> _Program:
+    """Split `code` into a cached `_Program`; re-runs of a script reuse it."""
+    return _Program(code.splitlines())
+
+
+def _as_program(lines: List[str]) -> _Program:
+    return lines if isinstance(lines, _Program) else _Program(lines)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_for_header(
+    header: str,
+) -> Union[Tuple[str, str, str, Optional[str]], EvalError]:
+    """Split a stripped `for name = start to end [step s]` header into parts.
+
+    Returns (varname, start_expr, end_expr, step_expr_or_None), or an
+    `EvalError` carrying the message and column of a malformed header. Cached
+    like `_compile_expr`, so a loop nested in another loop or in a function
+    parses its header once rather than on every entry.
+    """
+    body = header[len("for "):].strip()
+    if "=" not in body or " to " not in body:
+        return EvalError("Use: for name = start to end [step s]", column=1)
+    name_part, _, rest = body.partition("=")
+    varname = sys.intern(name_part.strip())
+    if not varname.isidentifier():
+        return EvalError("Invalid loop variable name", column=len("for ") + 1)
+    range_part, sep, step_part = rest.partition(" step ")
+    start_expr, sep_to, end_expr = range_part.partition(" to ")
+    if not sep_to:
+        return EvalError("Missing 'to' in for range", column=1)
+    return varname, start_expr.strip(), end_expr.strip(), step_part if sep else None
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_call(
+    line: str,
+) -> Union[Tuple[str, Tuple[str, ...], Optional[str]], EvalError]:
+    """Split a stripped `call name [with a, b] [into var]` line into parts.
+
+    Returns (name, arg_exprs, into_var_or_None), or an `EvalError` with the
+    message and column of a malformed line. Cached like `_parse_for_header`;
+    whether `name` exists and takes that many arguments is checked per call.
+    """
+    txt = line[len("call "):].strip()
+    if not txt:
+        return EvalError("Missing function name", column=1)
+    # split into main and optional 'into'
+    into_var = None
+    main, sep, into_part = txt.partition(" into ")
+    if sep:
+        into_var = sys.intern(into_part.strip())
+        if not into_var.isidentifier():
+            return EvalError(
+                "Invalid target after 'into'",
+                column=line.find(" into ") + len(" into ") + 1,
+            )
+    # handle optional 'with'
+    name_str, sep, args_str = main.partition(" with ")
+    name = name_str.strip()
+    args_exprs = (
+        tuple(s.strip() for s in args_str.split(",") if s.strip()) if sep else ()
+    )
+    if not name.isidentifier():
+        return EvalError("Invalid function name", column=len("call ") + 1)
+    return name, args_exprs, into_var
+
+
+def _float_steps(cur: float, end: float, step: float):
+    """Yield `for` loop values from `cur` towards `end` (inclusive) by `step`.
+
+    Whole numbers are yielded as ints so `for i = 0 to 1 step 0.5` binds
+    0, 0.5, 1 rather than 0.0, 0.5, 1.0.
+    """
+    while (cur <= end) if step > 0 else (cur >= end):
+        yield int(cur) if abs(cur - int(cur)) < 1e-9 else cur
+        cur += step
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_save_power(line: str) -> Optional[Tuple[float, float]]:
+    """Return (level, ops_scale) for a `savePower <level>` line, or None."""
+    try:
+        lvl = float(line[len("savePower "):].strip())
+    except Exception:
+        return None
+    return lvl, max(0.1, 1.0 - (lvl * 0.01))
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_assignment(line: str, prefix_len: int) -> Tuple[Optional[str], str, int]:
+    """Split a stripped `let`/`const` line after its `prefix_len`-char keyword.
+
+    Returns (name, expr, lhs_len): `name` interned (None when there is no
+    `=`), `expr` the right-hand side and `lhs_len` the length of the text
+    before `=`, for error columns. Whether `name` is a valid identifier is
+    left to the caller. Cached per line like `_parse_call`.
+    """
+    # the text after the keyword is stripped, so only the inner edges of
+    # the two sides need trimming
+    lhs, sep, rhs = line[prefix_len:].strip().partition("=")
+    if not sep:
+        return None, "", 0
+    return sys.intern(lhs.rstrip()), rhs.lstrip(), len(lhs)
+
+
+# The run loops compare `time.monotonic_ns()` (immune to wall-clock jumps,
+# and an int compare) against their deadline only when
+# `steps_local & _DEADLINE_CHECK_MASK == 0`, i.e. every 256 statements.
+_DEADLINE_CHECK_MASK = 0xFF
+
+
+def _deadline_ns(max_time_s: float) -> Union[int, float]:
+    """Return the `time.monotonic_ns()` value `max_time_s` seconds from now."""
+    try:
+        return time.monotonic_ns() + int(max_time_s * 1_000_000_000)
+    except (OverflowError, ValueError):
+        # an infinite (or NaN) budget never expires
+        return float("inf")
+
+# Shared read-only stand-in for omitted `inputs`/`settings` mappings.
+_EMPTY: Mapping[str, Any] = types.MappingProxyType({})
+
+
+def _buffered_lines(buf: io.StringIO) -> List[str]:
+    """Turn a newline-terminated output buffer back into output lines."""
+    return buf.getvalue().split("\n")[:-1]
+
+
+def _buffer_output(
+    buf: io.StringIO, lines: List[str], out_chars: int, max_out: int
+) -> Optional[int]:
+    """Write `lines` to `buf`, newline-terminated, and return the new length.
+
+    `out_chars` is the running length (newlines excluded). Returns None as
+    soon as a line would take it past `max_out`; the lines before it stay
+    written.
+    """
+    for o in lines:
+        out_chars += len(o)
+        if out_chars > max_out:
+            return None
+        buf.write(o)
+        buf.write("\n")
+    return out_chars
+
+
+class _RunConfig(NamedTuple):
+    """Eco tunables for one run: the instance defaults overlaid by its settings.
+
+    Taken as a snapshot so a run's `settings` never leak into the instance
+    (and so into later runs on it).
+    """
+
+    energy_per_op_J: float
+    idle_power_W: float
+    co2_per_kwh_g: float
+
+
+class _InterpState:
+    """Mutable state of one run loop, handed to statement handlers by reference.
+
+    `lines` is the `_Program` being run, `i` the index of the statement being
+    dispatched, `out`/`warns` what the frame has produced so far (`out_chars`
+    being the running length of `out`, for the output cap) and `total_ops`
+    the ops it has charged. Handlers read their inputs from here instead of
+    taking them as separate arguments.
+    """
+
+    __slots__ = (
+        "lines",
+        "i",
+        "env",
+        "inputs",
+        "out",
+        "out_chars",
+        "warns",
+        "total_ops",
+        "ops_scale",
+    )
+
+    def __init__(
+        self,
+        lines: _Program,
+        env: Dict[str, Any],
+        inputs: Mapping[str, Any],
+        ops_scale: float = 1.0,
+    ):
+        self.lines = lines
+        self.i = 0
+        self.env = env
+        self.inputs = inputs
+        self.out: List[str] = []
+        self.out_chars = 0
+        self.warns: List[str] = []
+        self.total_ops = 0
+        self.ops_scale = ops_scale
 
 
 class Interpreter:
@@ -294,13 +1014,23 @@ class Interpreter:
     - enforce runtime limits (steps, loops, wall-clock, output size),
     - account for operation counts so the server can estimate energy use.
 
-    Tunable attributes (defaults are set in __init__):
+    Tunable attributes (defaults are set by `reset`, which __init__ calls with
+    any `settings` passed to the constructor):
     - ops_map: estimated operation cost map used to compute total_ops
     - energy_per_op_J, idle_power_W, co2_per_kwh_g: eco estimation parameters
     - max_steps, max_loop, max_time_s, max_output_chars: runtime safety caps
     """
 
-    def __init__(self):
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.reset(settings)
+
+    def reset(self, settings: Optional[Dict[str, Any]] = None) -> None:
+        """Restore defaults and clear per-run state so the instance can be reused.
+
+        Args:
+            settings: optional (already server-capped) tunables applied over the
+                defaults, e.g. the dict returned by the API's `_cap_settings`.
+        """
         # Estimated operation cost mapping used to accumulate `total_ops`.
         self.ops_map = {
             "print": 50,
@@ -312,6 +1042,8 @@ class Interpreter:
             "other": 5,
             "func_call": 20,
         }
+        # Unscaled cost charged by the run loops for dispatching a statement
+        self._other_cost = int(self.ops_map.get("other", 5))
         # Eco/energy estimation tunables (can be overridden via settings)
         self.energy_per_op_J = 1e-9
         self.idle_power_W = 0.5
@@ -324,12 +1056,40 @@ class Interpreter:
         # Function-related constraints (green-friendly defaults)
         self.max_func_params = 3
         self.max_call_depth = 5
-        # Functions registry for this interpreter run: name -> {args: [...], block: [...]}
-        self.functions = {}
+        # Functions registry for this interpreter run: name -> (args, block)
+        self.functions: Dict[str, Tuple[List[str], List[str]]] = {}
         # Current call depth counter
         self._call_depth = 0
         # Constants defined via 'const'
-        self._consts = set()
+        self._consts: Set[str] = set()
+        # ops_scale -> {op: int(cost * ops_scale)}; see `_op_costs`
+        self._scaled_op_costs: Dict[float, Dict[str, int]] = {}
+        # (id(body), ops_scale, args) -> cached call result; see `_call_function`
+        self._call_memo: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+        if settings:
+            for key in (
+                "max_steps",
+                "max_loop",
+                "max_time_s",
+                "max_output_chars",
+                "energy_per_op_J",
+                "idle_power_W",
+                "co2_per_kwh_g",
+            ):
+                if key in settings:
+                    setattr(self, key, settings[key])
+
+    def _op_costs(self, ops_scale: float) -> Dict[str, int]:
+        """Return `ops_map` scaled by `ops_scale` and truncated to ints.
+
+        Memoized per scale: the scale only changes on `savePower`, so handlers
+        and loop bodies share one table instead of re-multiplying per statement.
+        """
+        costs = self._scaled_op_costs.get(ops_scale)
+        if costs is None:
+            costs = {k: int(v * ops_scale) for k, v in self.ops_map.items()}
+            self._scaled_op_costs[ops_scale] = costs
+        return costs
 
     # --- Error helpers -------------------------------------------------
     def _err(self, code: str, message: str, *, line: int, column: int = 1, line_text: Optional[str] = None, hint: Optional[str] = None) -> Dict[str, Any]:
@@ -354,56 +1114,32 @@ class Interpreter:
             err["hint"] = hint
         return err
 
-    def _run_sub_interpreter(
+    def _run_block_isolated(
         self,
-        code: str,
-        inputs: Dict[str, Any],
-        settings: Dict[str, Any],
-        env: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        """Run a fresh Interpreter for nested blocks to preserve state.
+        block: List[str],
+        inputs: Mapping[str, Any],
+        env: Dict[str, Any],
+    ) -> Tuple[List[str], List[str], int, Dict[str, Any]]:
+        """Run `block` on this instance as if it were a fresh sub-interpreter.
+
+        The block sees an empty function registry, no consts, call depth 0 and
+        its own step/time budget, without constructing a new Interpreter or
+        re-splitting the block text. `env` is used as-is, so
+        callers pass a copy when mutations must not leak out.
 
-        The original implementation used Interpreter().run directly; this
-        helper keeps the behaviour but centralizes the call site.
+        Returns (output_lines, warnings, total_ops, maybe_err).
         """
-        # Run a fresh Interpreter but seed its environment so nested blocks
-        # can access variables from the outer scope. This isolates state between
-        # nested blocks while allowing variable reads from `env` to flow in.
-        it = Interpreter()
-        # inherit limits from parent unless overridden in settings
-        it.max_steps = settings.get("max_steps", self.max_steps)
-        it.max_loop = settings.get("max_loop", self.max_loop)
-        it.max_time_s = settings.get("max_time_s", self.max_time_s)
-        it.max_output_chars = settings.get("max_output_chars", self.max_output_chars)
-        out_lines, warnings, total_ops, maybe_err, start_time = it._execute_core(
-            code, inputs, settings, initial_env=env
-        )
-        if maybe_err.get("errors"):
-            return {
-                "output": "\n".join(out_lines),
-                "warnings": warnings,
-                "eco": None,
-                "errors": maybe_err.get("errors"),
-            }
-        duration_s = max(0.000001, time.time() - start_time)
-        eco = it._compute_eco(total_ops, duration_s)
-        return {
-            "output": "\n".join(out_lines) + ("\n" if out_lines else ""),
-            "warnings": warnings,
-            "eco": eco,
-            "errors": None,
-        }
+        saved = (self.functions, self._consts, self._call_depth)
+        self.functions, self._consts, self._call_depth = {}, set(), 0
+        try:
+            return self._execute_lines(block, inputs, env)
+        finally:
+            self.functions, self._consts, self._call_depth = saved
 
     def _handle_if(  # noqa: C901
         self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
+        state: "_InterpState",
+        line: str,
     ) -> Tuple[
         int,
         int,
@@ -415,13 +1151,13 @@ class Interpreter:
 
         The method extracts the block between the starting `if` and the matching
         `end`, finds an optional top-level `else`, evaluates the condition using
-        `eval_expr`, and executes the chosen branch by invoking a nested
-        interpreter via `_run_sub_interpreter`.
+        `eval_expr`, and executes the chosen branch as a nested run via
+        `_run_block_isolated`.
 
         Returns a tuple (new_i, ops_delta, out_add, warn_add, error_or_none) in
         the same normalized shape used by the statement dispatching code.
         """
-        line = lines[i].strip()
+        lines, i, env, inputs = state.lines, state.i, state.env, state.inputs
         # Validate header shape: must end with ' then'
         if not line.endswith(" then"):
             return (
@@ -450,27 +1186,7 @@ class Interpreter:
                 self._err("SYNTAX_ERROR", str(e), line=i + 1, column=1, line_text=lines[i], hint="Add a matching 'end' for this 'if'."),
             )
 
-        # find optional else/elif at top level. We only support a single elif.
-        else_idx: Optional[int] = None
-        elif_idx: Optional[int] = None
-        elif_cond: Optional[str] = None
-        depth = 0
-        for j, r in enumerate(block):
-            t = r.strip()
-            if t.startswith("if ") or t.startswith("repeat ") or t.startswith("while ") or t.startswith("for "):
-                depth += 1
-                continue
-            if t == "end":
-                if depth > 0:
-                    depth -= 1
-                continue
-            if depth == 0:
-                if t == "else" and else_idx is None:
-                    else_idx = j
-                    break
-                if t.startswith("elif ") and t.endswith(" then") and elif_idx is None:
-                    elif_idx = j
-                    elif_cond = t[len("elif "):-len(" then")].strip()
+        then_block, elif_cond, elif_block, else_block = self._split_if_block(block)
         try:
             cond_val = eval_expr(cond_expr, env)
         except EvalError as e:
@@ -484,70 +1200,55 @@ class Interpreter:
                 self._err("RUNTIME_ERROR", str(e), line=i + 1, column=col, line_text=lines[i].strip(), hint="Fix the condition expression after 'if'."),
             )
 
-        # Determine segment ranges
-        end_then = len(block)
-        if elif_idx is not None:
-            end_then = min(end_then, elif_idx)
-        if else_idx is not None:
-            end_then = min(end_then, else_idx)
-
         if bool(cond_val):
-            exec_block = block[:end_then]
+            exec_block = then_block
+        elif elif_cond is not None and elif_block is not None:
+            # evaluate elif condition
+            try:
+                cond2 = eval_expr(elif_cond, env)
+            except EvalError as e:
+                base_col = 1 + len("if ")
+                col = base_col + (e.column or 1) - 1
+                return (
+                    i,
+                    0,
+                    [],
+                    [],
+                    self._err("RUNTIME_ERROR", str(e), line=i + 1, column=col, line_text=lines[i].strip(), hint="Fix the elif condition."),
+                )
+            exec_block = elif_block if bool(cond2) else else_block
         else:
-            if elif_idx is not None and elif_cond is not None:
-                # evaluate elif condition
-                try:
-                    cond2 = eval_expr(elif_cond, env)
-                except EvalError as e:
-                    base_col = 1 + len("if ")
-                    col = base_col + (e.column or 1) - 1
-                    return (
-                        i,
-                        0,
-                        [],
-                        [],
-                        self._err("RUNTIME_ERROR", str(e), line=i + 1, column=col, line_text=lines[i].strip(), hint="Fix the elif condition."),
-                    )
-                if bool(cond2):
-                    end_elif_block = else_idx if else_idx is not None else len(block)
-                    exec_block = block[elif_idx + 1 : end_elif_block]
-                else:
-                    exec_block = block[else_idx + 1 :] if else_idx is not None else []
-            else:
-                exec_block = block[else_idx + 1 :] if else_idx is not None else []
-
-        # Run the selected branch in a fresh interpreter to avoid mutating the
-        # outer scope. Nested runs inherit eco/limit settings.
-        sub_code = "\n".join(exec_block)
-        sub_res = self._run_sub_interpreter(
-            sub_code,
-            inputs=inputs,
-            settings={
-                "energy_per_op_J": self.energy_per_op_J,
-                "idle_power_W": self.idle_power_W,
-                "co2_per_kwh_g": self.co2_per_kwh_g,
-            },
-            env=env,
+            exec_block = else_block
+
+        # Run the selected branch isolated (as a fresh interpreter would) on
+        # this instance, so the outer scope is not mutated; a branch that
+        # cannot bind anything reads `env` directly instead of a copy.
+        if exec_block.writes_env():
+            env = dict(env)
+        sub_out, sub_warns, ops_delta, maybe_err = self._run_block_isolated(
+            exec_block, inputs, env
         )
-        if sub_res.get("errors"):
-            return (i, 0, [], [], sub_res)
-        out_add: List[str] = []
-        if sub_res.get("output"):
-            out_add = sub_res["output"].splitlines()
-        warn_add = sub_res.get("warnings", []) or []
-        ops_delta = sub_res.get("eco", {}).get("total_ops", 0)
-        return (end_idx + 1, ops_delta, out_add, warn_add, None)
+        if maybe_err.get("errors"):
+            # the error is reported as the nested run's whole result dict
+            return (
+                i,
+                0,
+                [],
+                [],
+                {
+                    "output": "\n".join(sub_out),
+                    "warnings": sub_warns,
+                    "eco": None,
+                    "errors": maybe_err["errors"],
+                },
+            )
+        # the nested run's lines are a fresh list, merged as-is like repeat's
+        return (end_idx + 1, ops_delta, sub_out, sub_warns, None)
 
     def _handle_repeat(
         self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
+        state: "_InterpState",
+        line: str,
     ) -> Tuple[
         int,
         int,
@@ -559,13 +1260,16 @@ class Interpreter:
 
         Behaviour notes:
         - If `n` exceeds `self.max_loop` it's truncated and a warning is added.
-        - Each iteration is executed using a fresh sub-interpreter to limit
-          cross-iteration state sharing.
+        - Each iteration runs the block in place (see `_run_repeat_iterations`)
+          on a copy of `env` to limit cross-iteration state sharing. As a
+          consequence iterations are identical, so the body is only executed
+          once and its result replayed.
 
         Returns:
             (new_index, ops_delta, output_lines_added, warnings_added, error_or_none)
         """
-        line = lines[i].strip()
+        lines, i, env, inputs = state.lines, state.i, state.env, state.inputs
+        total_ops, ops_scale = state.total_ops, state.ops_scale
         if not line.endswith(" times"):
             return (
                 i,
@@ -603,59 +1307,119 @@ class Interpreter:
             warn_msg = f"Repeat count limited to {self.max_loop}"
             n = self.max_loop
 
-        sub_code = "\n".join(block)
-        out_add: List[str] = []
-        warn_add: List[str] = []
-        ops_delta = 0
-
-        for _ in range(n):
-            # check step budget before each iteration to avoid runaway work
-            if total_ops + ops_delta > self.max_steps:
-                warn_add.append("Step limit exceeded inside repeat; aborted")
-                break
-            # account for a small loop-check cost per iteration
-            ops_delta += int(self.ops_map.get("loop_check", 5) * ops_scale)
-            sub_res = self._run_sub_interpreter(
-                sub_code,
-                inputs=inputs,
-                settings={
-                    "energy_per_op_J": self.energy_per_op_J,
-                    "idle_power_W": self.idle_power_W,
-                    "co2_per_kwh_g": self.co2_per_kwh_g,
-                },
-                env=env,
-            )
-            if sub_res.get("errors"):
-                return (i, 0, [], [], sub_res)
-            if sub_res.get("output"):
-                out_add.extend(sub_res["output"].splitlines())
-            warn_add.extend(sub_res.get("warnings", []))
-            ops_delta += sub_res.get("eco", {}).get("total_ops", 0)
+        loop_check = self._op_costs(ops_scale)["loop_check"]
+        out_add, warn_add, ops_delta, err = self._run_repeat_iterations(
+            block, inputs, env, n, self.max_steps - total_ops, loop_check
+        )
+        if err:
+            return (i, 0, [], [], err)
 
         # if we limited the repeat count, include the warning
         if 'warn_msg' in locals():
             warn_add.insert(0, warn_msg)
         return (end_idx + 1, ops_delta, out_add, warn_add, None)
 
-    def _find_else_index(self, block: List[str]) -> Optional[int]:
-        """Return the index of a top-level `else` in `block`, or None.
+    def _run_repeat_iterations(
+        self,
+        block: List[str],
+        inputs: Mapping[str, Any],
+        env: Dict[str, Any],
+        n: int,
+        budget: int,
+        loop_check: int,
+    ) -> Tuple[List[str], List[str], int, Optional[Dict[str, Any]]]:
+        """Run up to `n` isolated iterations of a repeat body.
 
-        Nested `if`/`repeat` blocks are tracked by `depth` so we only report an
-        `else` that belongs to the top-level block.
+        Every iteration starts from the same copy of the outer env with a
+        fresh function registry, so every iteration produces the same output,
+        warnings and ops. The body is run once and its effect replayed for as
+        many iterations as `budget` (the steps left before `max_steps`) allows.
+
+        Returns (output_lines, warnings, ops_delta, error_or_none).
         """
+        body: Optional[Tuple[List[str], List[str], int]] = None
+        iterations = 0
+        ops_delta = 0
+        step_limited = False
+        for _ in range(n):
+            # check step budget before each iteration to avoid runaway work
+            if ops_delta > budget:
+                step_limited = True
+                break
+            # account for a small loop-check cost per iteration
+            ops_delta += loop_check
+            if body is None:
+                sub_out, sub_warns, sub_ops, maybe_err = self._run_block_isolated(
+                    block, inputs, dict(env)
+                )
+                if maybe_err.get("errors"):
+                    return [], [], 0, {
+                        "output": "\n".join(sub_out),
+                        "warnings": sub_warns,
+                        "eco": None,
+                        "errors": maybe_err["errors"],
+                    }
+                body = (sub_out, sub_warns, sub_ops)
+            ops_delta += body[2]
+            iterations += 1
+
+        out_add: List[str] = body[0] * iterations if body else []
+        warn_add: List[str] = body[1] * iterations if body else []
+        if step_limited:
+            warn_add.append("Step limit exceeded inside repeat; aborted")
+        return out_add, warn_add, ops_delta, None
+
+    def _split_if_block(
+        self, block: List[str]
+    ) -> Tuple[_Program, Optional[str], Optional[_Program], _Program]:
+        """Split an if body into (then, elif_cond, elif_body, else_body).
+
+        Only the first top-level `elif` and `else` count; `elif_cond` and
+        `elif_body` are None without an elif, and a missing else gives an
+        empty body. The branches are `_Program` slices memoized on `block`,
+        so an `if` inside a loop reuses them (and their block caches).
+        """
+        program = _as_program(block)
+        if program._if_split is not None:
+            return program._if_split
+        else_idx: Optional[int] = None
+        elif_idx: Optional[int] = None
+        elif_cond: Optional[str] = None
         depth = 0
-        for j, r in enumerate(block):
-            t = r.strip()
-            if t.startswith("if ") or t.startswith("repeat ") or t.startswith("while ") or t.startswith("for "):
+        for j, k in enumerate(program.structure):
+            if k == _K_OPEN:
                 depth += 1
                 continue
-            if t == "end":
+            if k == _K_END:
                 if depth > 0:
                     depth -= 1
                 continue
-            if t == "else" and depth == 0:
-                return j
-        return None  # type: ignore (to review logic)
+            if depth == 0:
+                if k == _K_ELSE and else_idx is None:
+                    else_idx = j
+                    break
+                if k == _K_ELIF and elif_idx is None:
+                    elif_idx = j
+                    elif_cond = program.stripped[j][len("elif "):-len(" then")].strip()
+        n = len(program)
+        end_then = min(x for x in (n, elif_idx, else_idx) if x is not None)
+        else_block = (
+            program.slice(else_idx + 1, n)
+            if else_idx is not None
+            else program.slice(n, n)
+        )
+        elif_block = None
+        if elif_idx is not None:
+            elif_block = program.slice(
+                elif_idx + 1, else_idx if else_idx is not None else n
+            )
+        program._if_split = (
+            program.slice(0, end_then),
+            elif_cond,
+            elif_block,
+            else_block,
+        )
+        return program._if_split
 
     def _handle_say(
         self, line: str, env: Dict[str, Any], ops_scale: float
@@ -674,7 +1438,7 @@ class Interpreter:
             return (None, [], [], 0, {"code": "RUNTIME_ERROR", "message": str(e), "column": col})
         # output is stringified; _execute_core will check output length caps
         output = str(val)
-        ops_delta = int(self.ops_map.get("print", 50) * ops_scale)
+        ops_delta = self._op_costs(ops_scale)["print"]
         return (1, [output], [], ops_delta, None)
 
     def _handle_let(
@@ -684,9 +1448,9 @@ class Interpreter:
 
         Returns (step_inc, out_add, warn_add, ops_delta, error_or_none).
         """
-        # parse `let name = expr` and bind into `env`
-        rest = line[4:].strip()
-        if "=" not in rest:
+        # parse `let name = expr` (cached per line) and bind into `env`
+        name, expr, lhs_len = _parse_assignment(line, len("let "))
+        if name is None:
             return (
                 None,
                 [],
@@ -694,9 +1458,6 @@ class Interpreter:
                 0,
                 {"code": "SYNTAX_ERROR", "message": "Expected '=' in let statement", "hint": "Use: let name = expr"},
             )
-        name, expr = rest.split("=", 1)
-        name = name.strip()
-        expr = expr.strip()
         if not name.isidentifier():
             return (
                 None,
@@ -705,7 +1466,7 @@ class Interpreter:
                 0,
                 {"code": "SYNTAX_ERROR", "message": "Invalid identifier in let", "hint": "Identifiers must be letters/digits/_ and not start with a digit."},
             )
-        if name in getattr(self, "_consts", set()) and name in env:
+        if name in self._consts and name in env:
             return (
                 None,
                 [],
@@ -716,20 +1477,23 @@ class Interpreter:
         try:
             val = eval_expr(expr, env)
         except EvalError as e:
-            col = len("let ") + rest.find("=") + 1 + (e.column or 1)
+            col = len("let ") + lhs_len + 1 + (e.column or 1)
             return (None, [], [], 0, {"code": "RUNTIME_ERROR", "message": str(e), "column": col})
-        # assignment writes into the current environment
+        # assignment writes into the current environment; `name` is interned
+        # so compiled expressions (whose names are interned) match by identity
         env[name] = val
-        ops_delta = int(self.ops_map.get("assign", 5) * ops_scale)
+        ops_delta = self._op_costs(ops_scale)["assign"]
         return (1, [], [], ops_delta, None)
 
-    def _dispatch_const(self, line: str, i: int, env: Dict[str, Any], ops_scale: float):
-        rest = line[len("const "):].strip()
-        if "=" not in rest:
+    def _dispatch_const(
+        self,
+        state: "_InterpState",
+        line: str,
+    ):
+        i, env = state.i, state.env
+        name, expr, _ = _parse_assignment(line, len("const "))
+        if name is None:
             return i, 0, [], [], {"code": "SYNTAX_ERROR", "message": "Expected '=' in const", "hint": "Use: const NAME = expr"}
-        name, expr = rest.split("=", 1)
-        name = name.strip()
-        expr = expr.strip()
         if not name.isidentifier():
             return i, 0, [], [], {"code": "SYNTAX_ERROR", "message": "Invalid const name"}
         if name in env:
@@ -739,14 +1503,16 @@ class Interpreter:
         except EvalError as e:
             return i, 0, [], [], {"code": "RUNTIME_ERROR", "message": str(e)}
         env[name] = val
-        getattr(self, "_consts").add(name)
-        return i + 1, int(self.ops_map.get("assign", 5) * ops_scale), [], [], None
+        self._consts.add(name)
+        # a new const can make a memoized body's `let` fail on a later call
+        self._call_memo.clear()
+        return i + 1, self._op_costs(state.ops_scale)["assign"], [], [], None
 
     def _handle_ask(
         self,
         line: str,
         env: Dict[str, Any],
-        inputs: Dict[str, Any],
+        inputs: Mapping[str, Any],
         ops_scale: float,
     ) -> Tuple[
         Optional[int],
@@ -769,7 +1535,7 @@ class Interpreter:
                 {"code": "SYNTAX_ERROR", "message": "Invalid identifier in ask", "hint": "Use: ask name"},
             )
         if name in inputs:
-            env[name] = inputs[name]
+            env[sys.intern(name)] = inputs[name]
         else:
             return (
                 None,
@@ -778,7 +1544,7 @@ class Interpreter:
                 0,
                 {"code": "RUNTIME_ERROR", "message": f"Missing input for '{name}'"},
             )
-        ops_delta = int(self.ops_map.get("io", 200) * ops_scale)
+        ops_delta = self._op_costs(ops_scale)["io"]
         return (1, [], [], ops_delta, None)
 
     def _handle_warn(
@@ -791,7 +1557,7 @@ class Interpreter:
         except EvalError as e:
             return (None, [], [], 0, {"code": "RUNTIME_ERROR", "message": str(e)})
         warn = str(val)
-        ops_delta = int(self.ops_map.get("other", 5) * ops_scale)
+        ops_delta = self._op_costs(ops_scale)["other"]
         return (1, [], [warn], ops_delta, None)
 
     def _handle_ecotip(
@@ -808,7 +1574,7 @@ class Interpreter:
             "Prefer simpler math operations",
         ]
         tip = tips[total_ops % len(tips)]
-        ops_delta = int(self.ops_map.get("other", 5) * ops_scale)
+        ops_delta = self._op_costs(ops_scale)["other"]
         return (1, [f"ecoTip: {tip}"], [], ops_delta, None)
 
     def _extract_block_for_run(
@@ -819,24 +1585,27 @@ class Interpreter:
         """Extract lines until matching 'end', handling nested blocks.
         Returns (block_lines, index_of_end_line). This mirrors the local
         `extract_block` used inside `run` so helper methods can reuse it.
+        Results are memoized on the `_Program`, so loop bodies and re-runs of
+        the same source do not rescan.
         """
-        block: List[str] = []
+        program = _as_program(lines)
+        hit = program._blocks.get(start_idx)
+        if hit is not None:
+            return hit
+        structure = program.structure
         depth = 0
         j = start_idx
-        while j < len(lines):
-            raw = lines[j]
-            txt = raw.strip()
+        while j < len(structure):
+            k = structure[j]
             # track nested starts
-            if txt.startswith("if ") or txt.startswith("repeat ") or txt.startswith("func ") or txt.startswith("while ") or txt.startswith("for "):
+            if k == _K_OPEN or k == _K_FUNC:
                 depth += 1
-                block.append(raw)
-            elif txt == "end":
+            elif k == _K_END:
                 if depth == 0:
-                    return block, j
+                    hit = (program.slice(start_idx, j), j)
+                    program._blocks[start_idx] = hit
+                    return hit
                 depth -= 1
-                block.append(raw)
-            else:
-                block.append(raw)
             j += 1
         # if we reach here, unmatched block
         raise EvalError("Missing end for block")
@@ -846,67 +1615,94 @@ class Interpreter:
         self,
         block: List[str],
         env: Dict[str, Any],
-        inputs: Dict[str, Any],
+        inputs: Mapping[str, Any],
         ops_scale: float,
     ) -> Tuple[List[str], List[str], int, Optional[Dict[str, Any]]]:
         """Execute a block of lines reusing the given env.
 
         Returns (out_add, warn_add, ops_delta, err_or_none).
         """
-        out_lines: List[str] = []
-        warn_add: List[str] = []
-        ops_delta = 0
+        state = _InterpState(_as_program(block), env, inputs, ops_scale)
+        stripped = state.lines.stripped
+        kinds = state.lines.kinds
+        n = len(stripped)
+        out_lines = state.out
+        warn_add = state.warns
+        # loop-invariant attributes as locals
+        max_steps = self.max_steps
+        max_out = self.max_output_chars
+        other_cost = self._other_cost
+        dispatch = self._dispatch_statement
+        handlers = _STATEMENT_HANDLERS
+        reads_total = _READS_TOTAL_OPS
         i = 0
-        start_wall = time.time()
+        deadline = _deadline_ns(self.max_time_s)
         steps_local = 0
-        while i < len(block):
-            raw = block[i]
-            if time.time() - start_wall > self.max_time_s:
-                return out_lines, warn_add, ops_delta, {"code": "TIMEOUT", "message": "Time limit exceeded in block"}
-            if steps_local > self.max_steps:
+        # ops charged by handlers; the dispatch cost is steps_local * other_cost
+        ops = 0
+        while i < n:
+            if (
+                not steps_local & _DEADLINE_CHECK_MASK
+                and time.monotonic_ns() > deadline
+            ):
+                return (
+                    out_lines,
+                    warn_add,
+                    ops + steps_local * other_cost,
+                    {"code": "TIMEOUT", "message": "Time limit exceeded in block"},
+                )
+            if steps_local > max_steps:
                 warn_add.append("Step limit exceeded in block")
-                return out_lines, warn_add, ops_delta, {"code": "STEP_LIMIT", "message": "Step limit exceeded in block"}
-            line = raw.strip()
-            if not line or line.startswith("#"):
+                return (
+                    out_lines,
+                    warn_add,
+                    ops + steps_local * other_cost,
+                    {"code": "STEP_LIMIT", "message": "Step limit exceeded in block"},
+                )
+            kind = kinds[i]
+            if kind == _S_BLANK:
                 i += 1
                 continue
             steps_local += 1
-            ops_delta += self.ops_map.get("other", 5)
-            new_i, inner_ops, out_add, w_add, err = self._dispatch_statement(
-                block,
-                i,
-                line,
-                env,
-                inputs,
-                out_lines,
-                warn_add,
-                ops_delta,
-                ops_scale,
+            if reads_total[kind]:
+                state.total_ops = ops + steps_local * other_cost
+            state.i = i
+            handler = handlers[kind]
+            new_i, inner_ops, out_add, w_add, err = (
+                dispatch(state, stripped[i])
+                if handler is None
+                else handler(self, state, stripped[i])
             )
             if err:
-                return out_lines, warn_add, ops_delta, err
+                # table handlers' errors get position info; `dispatch` did that
+                if handler is not None:
+                    err = self._position_error(err, i, stripped[i])
+                return out_lines, warn_add, ops + steps_local * other_cost, err
             if out_add:
-                for o in out_add:
-                    if sum(len(x) for x in out_lines) + len(o) > self.max_output_chars:
-                        return out_lines, warn_add, ops_delta, {"code": "OUTPUT_LIMIT", "message": "Output length limit reached in block"}
-                    out_lines.append(o)
-            if w_add:
-                warn_add.extend(w_add)
-            ops_delta += inner_ops
+                # callers drop a failed block's output, so the cap is checked
+                # once for the whole batch (lengths only grow the total)
+                out_chars = state.out_chars + sum(map(len, out_add))
+                if out_chars > max_out:
+                    return (
+                        out_lines,
+                        warn_add,
+                        ops + steps_local * other_cost,
+                        {
+                            "code": "OUTPUT_LIMIT",
+                            "message": "Output length limit reached in block",
+                        },
+                    )
+                out_lines += out_add
+                state.out_chars = out_chars
+            warn_add += w_add
+            ops += inner_ops
             i = new_i
-        return out_lines, warn_add, ops_delta, None
+        return out_lines, warn_add, ops + steps_local * other_cost, None
 
     def _dispatch_statement(
         self,
-        lines: List[str],
-        i: int,
+        state: "_InterpState",
         line: str,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
     ) -> Tuple[
         int,
         int,
@@ -914,20 +1710,58 @@ class Interpreter:
         List[str],
         Optional[Dict[str, Any]],
     ]:
-        """Dispatch a single statement at index `i`.
+        """Dispatch the statement `line` at index `state.i`.
 
         Returns (new_i, ops_delta, out_add, warn_add, error_or_none)
         """
-        # minimal-dispatch: map first token to a handler that returns the
-        # unified tuple. This reduces branching inside this function.
-        token = line.split(None, 1)[0] if line else ""
-
-        # handle single-word special tokens first
-        if line == "ecoTip":
-            return self._dispatch_ecotip(total_ops, i, ops_scale)
-        if token == "savePower":
-            return self._dispatch_save_power(line, i, env)
-        if token == "else":
+        # minimal-dispatch: the line's precomputed statement kind indexes
+        # `_STATEMENT_HANDLERS`, each returning the unified tuple. Kinds
+        # without a handler (rare) are resolved by `_dispatch_unhandled`.
+        # The run loops index the table themselves and only come here for
+        # those kinds.
+        i = state.i
+        kind = state.lines.kinds[i]
+        handler = _STATEMENT_HANDLERS[kind]
+        if handler is None:
+            return self._dispatch_unhandled(state, line, kind)
+        # all handlers return normalized (new_i, ops_delta, out_add, warn_add, err)
+        new_i, ops_delta, out_add, warn_add, err = handler(self, state, line)
+        if err:
+            return i, 0, [], [], self._position_error(err, i, line)
+        return new_i, ops_delta, out_add, warn_add, None
+
+    def _position_error(
+        self, err: Dict[str, Any], i: int, line: str
+    ) -> Optional[Dict[str, Any]]:
+        # Enrich a table handler's error with position info if missing
+        return self._with_position(
+            err, line=i + 1, column=err.get("column", 1), line_text=line
+        )
+
+    def _dispatch_unhandled(
+        self,
+        state: "_InterpState",
+        line: str,
+        kind: int,
+    ) -> Tuple[
+        int,
+        int,
+        List[str],
+        List[str],
+        Optional[Dict[str, Any]],
+    ]:
+        """Handle the statement kinds `_STATEMENT_HANDLERS` has no entry for.
+
+        `ecoTip` and `savePower` return their results as-is (without the
+        position enrichment table handlers get); stray `else`/`end` and
+        unknown commands are syntax errors.
+        """
+        i = state.i
+        if kind == _S_ECOTIP:
+            return self._dispatch_ecotip(state.total_ops, i, state.ops_scale)
+        if kind == _S_SAVE_POWER:
+            return self._dispatch_save_power(line, i, state.env)
+        if kind == _S_ELSE:
             return (
                 i,
                 0,
@@ -942,7 +1776,7 @@ class Interpreter:
                     hint="Place 'else' inside an if..end block.",
                 ),
             )
-        if token == "end":
+        if kind == _S_END:
             return (
                 i,
                 0,
@@ -957,75 +1791,22 @@ class Interpreter:
                     hint="Remove extra 'end' or match it with if/repeat/func.",
                 ),
             )
+        return (
+            i,
+            0,
+            [],
+            [],
+            self._err("SYNTAX_ERROR", f"Unknown statement: {line}", line=i + 1, column=1, line_text=line, hint="Check the command name or syntax."),
+        )
 
-        dispatch_map = {
-            "say": lambda: self._dispatch_simple_prefix(
-                line, i, env, ops_scale
-            ),
-            "let": lambda: self._dispatch_simple_prefix(
-                line, i, env, ops_scale
-            ),
-            "const": lambda: self._dispatch_const(line, i, env, ops_scale),
-            "warn": lambda: self._dispatch_simple_prefix(
-                line, i, env, ops_scale
-            ),
-            "ask": lambda: self._dispatch_ask(
-                line, i, env, inputs, ops_scale
-            ),
-            "func": lambda: self._dispatch_func_def(lines, i),
-            "call": lambda: self._dispatch_func_call(line, i, env, inputs, ops_scale),
-            "if": lambda: self._dispatch_control_if(
-                lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale
-            ),
-            "repeat": lambda: self._dispatch_control_repeat(
-                lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale
-            ),
-            "while": lambda: self._dispatch_control_while(
-                lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale
-            ),
-            "for": lambda: self._dispatch_control_for(
-                lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale
-            ),
-            # future: while/for/withBudget can be added here when implemented
-        }
-
-        handler = dispatch_map.get(token)
-        if not handler:
-            return (
-                i,
-                0,
-                [],
-                [],
-                self._err("SYNTAX_ERROR", f"Unknown statement: {line}", line=i + 1, column=1, line_text=line, hint="Check the command name or syntax."),
-            )
-        res = handler()
-        if not res:
-            return (
-                i,
-                0,
-                [],
-                [],
-                self._err("SYNTAX_ERROR", f"Unknown statement: {line}", line=i + 1, column=1, line_text=line, hint="Check the command name or syntax."),
-            )
-        # all handlers return normalized (new_i, ops_delta, out_add, warn_add, err)
-        try:
-            new_i, ops_delta, out_add, warn_add, err = res
-        except Exception:
-            return (
-                i,
-                0,
-                [],
-                [],
-                {"code": "INTERNAL", "message": "Invalid handler result"},
-            )
-        if err:
-            # Enrich with position info if missing
-            return i, 0, [], [], self._with_position(err, line=i + 1, column=err.get("column", 1), line_text=line)
-        return new_i, ops_delta, out_add, warn_add, None
-
-    def _dispatch_func_def(self, lines: List[str], i: int):
+    def _dispatch_func_def(
+        self,
+        state: "_InterpState",
+        line: str,
+    ):
         # Parse: func name [arg1 arg2 ...]\n ... \n end
-        header = lines[i].strip()
+        lines, i = state.lines, state.i
+        header = line
         rest = header[len("func "):].strip()
         parts = rest.split()
         if not parts:
@@ -1045,7 +1826,7 @@ class Interpreter:
                 [],
                 self._err("SYNTAX_ERROR", "Invalid function name", line=i + 1, column=len("func ") + 1, line_text=lines[i]),
             )
-        args = parts[1:]
+        args = [sys.intern(a) for a in parts[1:]]
         if len(args) > self.max_func_params:
             return (
                 i,
@@ -1059,52 +1840,46 @@ class Interpreter:
         except EvalError as e:
             return (i, 0, [], [], self._err("SYNTAX_ERROR", str(e), line=i + 1, column=1, line_text=lines[i], hint="Add a matching 'end' for this 'func'."))
         # store function (exclude trailing 'end' inside block if present at top level)
-        self.functions[name] = {"args": args, "block": block}
+        # as an (args, block) pair, unpacked once per call
+        self.functions[name] = (args, block)
         # small op cost for definition bookkeeping
-        return end_idx + 1, int(self.ops_map.get("other", 5)), [], [f"func defined: {name}"], None
+        return end_idx + 1, self._other_cost, [], [f"func defined: {name}"], None
 
     def _dispatch_func_call(
         self,
+        state: "_InterpState",
         line: str,
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        ops_scale: float,
     ):
         # Syntax: call name [with expr1, expr2, ...] [into var]
         # Examples:
         #   call add with 1, 2 into result
         #   call greet with "Eco"  (prints return value if no 'into')
-        txt = line[len("call "):].strip()
-        if not txt:
-            return i, 0, [], [], self._err("SYNTAX_ERROR", "Missing function name", line=i + 1, column=1, line_text=line)
-        # split into main and optional 'into'
-        into_var = None
-        if " into " in txt:
-            main, into_part = txt.split(" into ", 1)
-            into_var = into_part.strip()
-            if not into_var.isidentifier():
-                return i, 0, [], [], self._err("SYNTAX_ERROR", "Invalid target after 'into'", line=i + 1, column=line.find(" into ") + len(" into ") + 1, line_text=line)
-        else:
-            main = txt
-        # handle optional 'with'
-        if " with " in main:
-            name_str, args_str = main.split(" with ", 1)
-            name = name_str.strip()
-            args_exprs = [s.strip() for s in args_str.split(",") if s.strip()]
-        else:
-            name = main.strip()
-            args_exprs = []
-        if not name.isidentifier():
-            return i, 0, [], [], self._err("SYNTAX_ERROR", "Invalid function name", line=i + 1, column=len("call ") + 1, line_text=line)
-        if name not in self.functions:
+        i, env = state.i, state.env
+        parsed = _parse_call(line)
+        if isinstance(parsed, EvalError):
+            return (
+                i,
+                0,
+                [],
+                [],
+                self._err(
+                    "SYNTAX_ERROR",
+                    str(parsed),
+                    line=i + 1,
+                    column=parsed.column or 1,
+                    line_text=line,
+                ),
+            )
+        name, args_exprs, into_var = parsed
+        spec = self.functions.get(name)
+        if spec is None:
             return i, 0, [], [], self._err("RUNTIME_ERROR", f"Unknown function '{name}'", line=i + 1, column=len("call ") + 1, line_text=line)
-        spec = self.functions[name]
-        if len(args_exprs) != len(spec["args"]):
+        params, body = spec
+        if len(args_exprs) != len(params):
             return i, 0, [], [], self._err("RUNTIME_ERROR", "Argument count mismatch", line=i + 1, column=line.find(" with ") + 1 if " with " in line else len("call ") + 1, line_text=line)
         # evaluate arguments in current env
         call_args: Dict[str, Any] = {}
-        for arg_name, expr in zip(spec["args"], args_exprs):
+        for arg_name, expr in zip(params, args_exprs):
             try:
                 call_args[arg_name] = eval_expr(expr, env)
             except EvalError as e:
@@ -1114,11 +1889,21 @@ class Interpreter:
                 return i, 0, [], [], self._err("RUNTIME_ERROR", str(e), line=i + 1, column=base + 1, line_text=line)
         # execute the function body with local env seeded with call_args
         try:
-            ret_val, out_lines, warn_add, inner_ops = self._execute_function(name, spec["block"], call_args, inputs, ops_scale)
+            ret_val, out_lines, warn_add, inner_ops = self._call_function(
+                name, body, call_args, state.inputs, state.ops_scale
+            )
         except EvalError as e:
-            return i, 0, [], [], self._err("RUNTIME_ERROR", str(e), line=i + 1, column=1, line_text=line)
+            return (
+                i,
+                0,
+                [],
+                [],
+                self._err(
+                    "RUNTIME_ERROR", str(e), line=i + 1, column=1, line_text=line
+                ),
+            )
         # charge a function call op cost and accumulate any inner ops
-        ops_delta = int(self.ops_map.get("func_call", 20) * ops_scale) + inner_ops
+        ops_delta = self._op_costs(state.ops_scale)["func_call"] + inner_ops
         out_add: List[str] = []
         if out_lines:
             out_add.extend(out_lines)
@@ -1130,39 +1915,103 @@ class Interpreter:
                 out_add.append(str(ret_val))
         return i + 1, ops_delta, out_add, warn_add, None
 
+    def _call_function(
+        self,
+        name: str,
+        block: List[str],
+        args_env: Dict[str, Any],
+        inputs: Mapping[str, Any],
+        ops_scale: float,
+    ) -> Tuple[Any, List[str], List[str], int]:
+        """`_execute_function`, memoized for pure bodies and scalar values.
+
+        A body whose lines pass `_Program.pure_body()` returns the same value,
+        output, warnings and op count for the same arguments and op scale, so
+        repeat calls replay the first one (ops are still charged in full).
+        Errors are never cached and the call depth limit is still enforced.
+        """
+        key = None
+        if type(block) is _Program and block.pure_body():
+            args_key = _memo_key(args_env.values())
+            if args_key is not None:
+                key = (id(block), ops_scale, args_key)
+                hit = self._call_memo.get(key)
+                # the stored body guards against a reused id()
+                if hit is not None and hit[0] is block:
+                    if self._call_depth >= self.max_call_depth:
+                        raise EvalError("Call depth limit exceeded")
+                    _, ret_val, out_lines, warn_add, inner_ops = hit
+                    return ret_val, list(out_lines), list(warn_add), inner_ops
+        ret_val, out_lines, warn_add, inner_ops = self._execute_function(
+            name, block, args_env, inputs, ops_scale
+        )
+        if (
+            key is not None
+            and type(ret_val) in _MEMO_TYPES
+            and len(self._call_memo) < _CALL_MEMO_MAX
+        ):
+            self._call_memo[key] = (
+                block,
+                ret_val,
+                tuple(out_lines),
+                tuple(warn_add),
+                inner_ops,
+            )
+        return ret_val, out_lines, warn_add, inner_ops
+
     def _execute_function(
         self,
         name: str,
         block: List[str],
         args_env: Dict[str, Any],
-        inputs: Dict[str, Any],
+        inputs: Mapping[str, Any],
         ops_scale: float,
     ) -> Tuple[Any, List[str], List[str], int]:
+        # `args_env` becomes the function's local env and is mutated by the
+        # body; callers pass a dict built for this call (see
+        # `_dispatch_func_call`), so it is used without copying.
         # Enforce call depth (prevent deep/recursive calls)
         if self._call_depth >= self.max_call_depth:
             raise EvalError("Call depth limit exceeded")
         self._call_depth += 1
         try:
-            local_env: Dict[str, Any] = dict(args_env)
-            out_lines: List[str] = []
-            warn_add: List[str] = []
-            ops_delta = 0
+            local_env = args_env
+            state = _InterpState(_as_program(block), local_env, inputs, ops_scale)
+            stripped = state.lines.stripped
+            kinds = state.lines.kinds
+            n = len(stripped)
+            out_lines = state.out
+            warn_add = state.warns
+            # loop-invariant attributes as locals
+            max_steps = self.max_steps
+            max_out = self.max_output_chars
+            other_cost = self._other_cost
+            dispatch = self._dispatch_statement
+            handlers = _STATEMENT_HANDLERS
+            reads_total = _READS_TOTAL_OPS
             i = 0
             steps_local = 0
-            start_wall = time.time()
-            while i < len(block):
-                raw = block[i]
-                if time.time() - start_wall > self.max_time_s:
+            # ops charged by handlers; the dispatch cost is steps_local * other_cost
+            ops = 0
+            deadline = _deadline_ns(self.max_time_s)
+            while i < n:
+                if (
+                    not steps_local & _DEADLINE_CHECK_MASK
+                    and time.monotonic_ns() > deadline
+                ):
                     raise EvalError("Time limit exceeded in function")
-                if steps_local > self.max_steps:
+                if steps_local > max_steps:
                     warn_add.append("Step limit exceeded in function")
                     raise EvalError("Step limit exceeded in function")
-                line = raw.strip()
-                if not line or line.startswith("#"):
+                kind = kinds[i]
+                if kind == _S_BLANK:
                     i += 1
                     continue
+                line = stripped[i]
                 # return handling
-                if line.startswith("return ") or line == "return":
+                if kind == _S_RETURN and (
+                    line == "return" or line.startswith("return ")
+                ):
                     expr = line[len("return"):].strip()
                     if expr:
                         try:
@@ -1171,45 +2020,40 @@ class Interpreter:
                             raise EvalError(str(e))
                     else:
                         val = None
-                    return val, out_lines, warn_add, ops_delta
+                    return val, out_lines, warn_add, ops + steps_local * other_cost
                 steps_local += 1
-                # charge small dispatch cost
-                ops_delta += self.ops_map.get("other", 5)
-                new_i, inner_ops, out_add, w_add, err = self._dispatch_statement(
-                    block,
-                    i,
-                    line,
-                    local_env,
-                    inputs,
-                    out_lines,
-                    warn_add,
-                    ops_delta,
-                    ops_scale,
-                )
+                if reads_total[kind]:
+                    state.total_ops = ops + steps_local * other_cost
+                state.i = i
+                handler = handlers[kind]
+                if handler is None:
+                    new_i, inner_ops, out_add, w_add, err = dispatch(state, line)
+                else:
+                    new_i, inner_ops, out_add, w_add, err = handler(self, state, line)
                 if err:
                     # propagate errors as EvalError inside function context
                     raise EvalError(err.get("message", "Function error"))
                 if out_add:
-                    for o in out_add:
-                        if sum(len(x) for x in out_lines) + len(o) > self.max_output_chars:
-                            raise EvalError("Output length limit reached in function")
-                        out_lines.append(o)
+                    # the output is dropped with the raise, so check the cap
+                    # once for the whole batch
+                    out_chars = state.out_chars + sum(map(len, out_add))
+                    if out_chars > max_out:
+                        raise EvalError("Output length limit reached in function")
+                    out_lines += out_add
+                    state.out_chars = out_chars
                 if w_add:
-                    warn_add.extend(w_add)
-                ops_delta += inner_ops
+                    warn_add += w_add
+                ops += inner_ops
                 i = new_i
             # implicit return None if no return seen
-            return None, out_lines, warn_add, ops_delta
+            return None, out_lines, warn_add, ops + steps_local * other_cost
         finally:
             self._call_depth -= 1
 
     def _dispatch_ask(
         self,
+        state: "_InterpState",
         line: str,
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        ops_scale: float,
     ) -> Tuple[
         int,
         int,
@@ -1217,17 +2061,16 @@ class Interpreter:
         List[str],
         Optional[Dict[str, Any]],
     ]:
-        res = self._handle_ask(line, env, inputs, ops_scale)
+        i = state.i
+        res = self._handle_ask(line, state.env, state.inputs, state.ops_scale)
         if res[4]:
             return i, 0, [], [], res[4]
         _, out_add, warn_add, ops_delta, _ = res
         return i + 1, ops_delta, out_add, warn_add, None
 
     def _dispatch_save_power(self, line: str, i: int, env: Dict[str, Any]):
-        val = line[len("savePower ") :].strip()
-        try:
-            lvl = float(val)
-        except Exception:
+        parsed = _parse_save_power(line)
+        if parsed is None:
             return (
                 i,
                 0,
@@ -1238,93 +2081,19 @@ class Interpreter:
                     "message": "Invalid number for savePower",
                 },
             )
-        new_scale = max(0.1, 1.0 - (lvl * 0.01))
-        # persist new ops scale into env for caller to pick up
+        lvl, new_scale = parsed
+        # persist new ops scale into env for caller to pick up; `_op_costs`
+        # keeps one scaled cost table per scale, so nothing to invalidate
         env["_ops_scale"] = new_scale
         return i + 1, 0, [], [f"savePower applied: level {lvl}"], None
 
-    def _dispatch_control_if(
-        self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
-    ):
-        return self._handle_if(
-            lines,
-            i,
-            env,
-            inputs,
-            output_lines,
-            warnings,
-            total_ops,
-            ops_scale,
-        )
-
-    def _dispatch_control_repeat(
-        self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
-    ):
-        return self._handle_repeat(
-            lines,
-            i,
-            env,
-            inputs,
-            output_lines,
-            warnings,
-            total_ops,
-            ops_scale,
-        )
-
-    def _dispatch_control_while(
-        self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
-    ):
-        return self._handle_while(lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale)
-
-    def _dispatch_control_for(
-        self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
-    ):
-        return self._handle_for(lines, i, env, inputs, output_lines, warnings, total_ops, ops_scale)
-
     def _handle_while(
         self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
+        state: "_InterpState",
+        line: str,
     ):
-        line = lines[i].strip()
+        lines, i, env, inputs = state.lines, state.i, state.env, state.inputs
+        total_ops, ops_scale = state.total_ops, state.ops_scale
         if not line.endswith(" then"):
             return i, 0, [], [], self._err(
                 "SYNTAX_ERROR",
@@ -1344,25 +2113,33 @@ class Interpreter:
         warn_add: List[str] = []
         ops_delta = 0
         iterations = 0
+        loop_check = self._op_costs(ops_scale)["loop_check"]
+        max_loop = self.max_loop
+        # ops this loop may add before the step budget is exhausted
+        ops_budget = self.max_steps - total_ops
+        run_block = self._execute_block_inline
+        cond = _compile_expr(cond_expr)
         while True:
             # Evaluate condition in current env
             try:
-                cond_val = eval_expr(cond_expr, env)
+                cond_val = _eval_compiled(cond, env)
             except EvalError as e:
                 base_col = 1 + len("while ")
                 col = base_col + (e.column or 1) - 1
                 return i, 0, [], [], self._err("RUNTIME_ERROR", str(e), line=i + 1, column=col, line_text=lines[i].strip(), hint="Fix the while condition.")
             if not bool(cond_val):
                 break
-            if iterations >= self.max_loop:
-                warn_add.append(f"While iterations limited to {self.max_loop}")
+            if iterations >= max_loop:
+                warn_add.append(f"While iterations limited to {max_loop}")
                 break
-            if total_ops + ops_delta > self.max_steps:
+            if ops_delta > ops_budget:
                 warn_add.append("Step limit exceeded inside while; aborted")
                 break
-            ops_delta += int(self.ops_map.get("loop_check", 5) * ops_scale)
+            ops_delta += loop_check
             # Execute block inline so env mutations persist
-            block_out, block_warns, block_ops, err = self._execute_block_inline(block, env, inputs, ops_scale)
+            block_out, block_warns, block_ops, err = run_block(
+                block, env, inputs, ops_scale
+            )
             if err:
                 return i, 0, [], [], err
             if block_out:
@@ -1375,37 +2152,28 @@ class Interpreter:
 
     def _handle_for(
         self,
-        lines: List[str],
-        i: int,
-        env: Dict[str, Any],
-        inputs: Dict[str, Any],
-        output_lines: List[str],
-        warnings: List[str],
-        total_ops: int,
-        ops_scale: float,
+        state: "_InterpState",
+        line: str,
     ):
         # Syntax: for name = start to end [step s]
-        header = lines[i].strip()
-        body = header[len("for "):].strip()
-        if "=" not in body or " to " not in body:
-            return i, 0, [], [], self._err(
-                "SYNTAX_ERROR",
-                "Use: for name = start to end [step s]",
-                line=i + 1,
-                column=1,
-                line_text=lines[i],
+        lines, i, env, inputs = state.lines, state.i, state.env, state.inputs
+        total_ops, ops_scale = state.total_ops, state.ops_scale
+        parsed = _parse_for_header(line)
+        if isinstance(parsed, EvalError):
+            return (
+                i,
+                0,
+                [],
+                [],
+                self._err(
+                    "SYNTAX_ERROR",
+                    str(parsed),
+                    line=i + 1,
+                    column=parsed.column or 1,
+                    line_text=lines[i],
+                ),
             )
-        name_part, rest = body.split("=", 1)
-        varname = name_part.strip()
-        if not varname.isidentifier():
-            return i, 0, [], [], self._err("SYNTAX_ERROR", "Invalid loop variable name", line=i + 1, column=len("for ") + 1, line_text=lines[i])
-        if " step " in rest:
-            range_part, step_part = rest.split(" step ", 1)
-        else:
-            range_part, step_part = rest, None
-        if " to " not in range_part:
-            return i, 0, [], [], self._err("SYNTAX_ERROR", "Missing 'to' in for range", line=i + 1, column=1, line_text=lines[i])
-        start_expr, end_expr = [s.strip() for s in range_part.split(" to ", 1)]
+        varname, start_expr, end_expr, step_part = parsed
         try:
             start_val = eval_expr(start_expr, env)
             end_val = eval_expr(end_expr, env)
@@ -1429,19 +2197,35 @@ class Interpreter:
         warn_add: List[str] = []
         ops_delta = 0
         iterations = 0
-        # Helper to check loop condition depending on step
-        def cont(c: float) -> bool:
-            return (c <= endf) if stepf > 0 else (c >= endf)
-        while cont(cur):
-            if iterations >= self.max_loop:
-                warn_add.append(f"For iterations limited to {self.max_loop}")
+        loop_check = self._op_costs(ops_scale)["loop_check"]
+        max_loop = self.max_loop
+        # ops this loop may add before the step budget is exhausted
+        ops_budget = self.max_steps - total_ops
+        run_block = self._execute_block_inline
+        if (
+            isinstance(start_val, int)
+            and isinstance(end_val, int)
+            and isinstance(step_val, int)
+        ):
+            # integer bounds (the common case): the same values the float
+            # stepping yields, without per-iteration float arithmetic
+            values: Any = range(
+                start_val, end_val + (1 if step_val > 0 else -1), step_val
+            )
+        else:
+            values = _float_steps(cur, endf, stepf)
+        for value in values:
+            if iterations >= max_loop:
+                warn_add.append(f"For iterations limited to {max_loop}")
                 break
-            if total_ops + ops_delta > self.max_steps:
+            if ops_delta > ops_budget:
                 warn_add.append("Step limit exceeded inside for; aborted")
                 break
-            env[varname] = int(cur) if abs(cur - int(cur)) < 1e-9 else cur
-            ops_delta += int(self.ops_map.get("loop_check", 5) * ops_scale)
-            block_out, block_warns, block_ops, err = self._execute_block_inline(block, env, inputs, ops_scale)
+            env[varname] = value
+            ops_delta += loop_check
+            block_out, block_warns, block_ops, err = run_block(
+                block, env, inputs, ops_scale
+            )
             if err:
                 return i, 0, [], [], err
             if block_out:
@@ -1450,39 +2234,74 @@ class Interpreter:
                 warn_add.extend(block_warns)
             ops_delta += block_ops
             iterations += 1
-            cur += stepf
         return end_idx + 1, ops_delta, out_add, warn_add, None
 
-    def _dispatch_simple_prefix(
+    def _dispatch_say(
         self,
+        state: "_InterpState",
         line: str,
-        i: int,
-        env: Dict[str, Any],
-        ops_scale: float,
     ):
-        """Handle simple 'say', 'let', 'warn' prefixes returning a small tuple.
+        """Handle a `say` line; `_dispatch_let`/`_dispatch_warn` likewise.
+
+        The statement kind already identifies the command, so each only
+        checks for the separating space (a bare `say` is a no-op that does
+        not advance, as before).
 
         Returns (step_inc, ops_delta, out_add, warn_add, error_or_none).
         """
-        if line.startswith("say "):
-            res = self._handle_say(line, env, ops_scale)
-            if res[4]:
-                return i, 0, [], [], res[4]
-            _, out_add, warn_add, ops_delta, _ = res
-            return i + 1, ops_delta, out_add, warn_add, None
-        if line.startswith("let "):
-            res = self._handle_let(line, env, ops_scale)
-            if res[4]:
-                return i, 0, [], [], res[4]
-            _, out_add, warn_add, ops_delta, _ = res
-            return i + 1, ops_delta, out_add, warn_add, None
-        if line.startswith("warn "):
-            res = self._handle_warn(line, env, ops_scale)
-            if res[4]:
-                return i, 0, [], [], res[4]
-            _, out_add, warn_add, ops_delta, _ = res
-            return i + 1, ops_delta, out_add, warn_add, None
-        return i, 0, [], [], None
+        if not line.startswith("say "):
+            return state.i, 0, [], [], None
+        return self._simple_result(
+            state.i, self._handle_say(line, state.env, state.ops_scale)
+        )
+
+    def _dispatch_let(
+        self,
+        state: "_InterpState",
+        line: str,
+    ):
+        if not line.startswith("let "):
+            return state.i, 0, [], [], None
+        # fast path for the common case (arithmetic loop bodies are mostly
+        # `let`): bind directly; any failure re-runs through `_handle_let`,
+        # which rebuilds the exact error (expressions have no side effects)
+        name, expr, _ = _parse_assignment(line, 4)
+        if name is not None and name not in self._consts and name.isidentifier():
+            env = state.env
+            try:
+                env[name] = _eval_compiled(_compile_expr(expr), env)
+            except EvalError:
+                pass
+            else:
+                return (
+                    state.i + 1,
+                    self._op_costs(state.ops_scale)["assign"],
+                    [],
+                    [],
+                    None,
+                )
+        return self._simple_result(
+            state.i, self._handle_let(line, state.env, state.ops_scale)
+        )
+
+    def _dispatch_warn(
+        self,
+        state: "_InterpState",
+        line: str,
+    ):
+        if not line.startswith("warn "):
+            return state.i, 0, [], [], None
+        return self._simple_result(
+            state.i, self._handle_warn(line, state.env, state.ops_scale)
+        )
+
+    @staticmethod
+    def _simple_result(i: int, res: Any):
+        # normalize a _handle_say/_handle_let/_handle_warn result
+        if res[4]:
+            return i, 0, [], [], res[4]
+        _, out_add, warn_add, ops_delta, _ = res
+        return i + 1, ops_delta, out_add, warn_add, None
 
     def _finalize_run(
         self,
@@ -1490,15 +2309,22 @@ class Interpreter:
         warnings: List[str],
         total_ops: int,
         start_time: float,
+        config: Optional[_RunConfig] = None,
     ) -> Dict[str, Any]:
         """Compute eco stats and produce final run result dict."""
-        duration_s = max(0.000001, time.time() - start_time)
-        eco = self._compute_eco(total_ops, duration_s)
+        eco = self._compute_eco(
+            total_ops, max(0.000001, time.time() - start_time), config
+        )
         # re-add a runtime warning if usage is high
         if total_ops > 1000:
             warnings.append("High estimated energy use")
+        # every output line is newline-terminated; `+=` on the only reference
+        # to the joined string extends it in place instead of copying it
+        output = "\n".join(output_lines)
+        if output_lines:
+            output += "\n"
         return {
-            "output": "\n".join(output_lines) + ("\n" if output_lines else ""),
+            "output": output,
             "warnings": warnings,
             "eco": eco,
             "errors": None,
@@ -1513,12 +2339,13 @@ class Interpreter:
         _, out_add, warn_add, ops_delta, _ = res
         return i + 1, ops_delta, out_add, warn_add, None
 
-    def _maybe_run_in_subprocess(self, settings: Dict[str, Any], code: str):
-        # Run the provided code in a sandboxed subprocess. This isolates
-        # potentially expensive or unsafe executions from the main process.
+    def _maybe_run_in_subprocess(self, settings: Mapping[str, Any], code: str):
+        # Run the provided code in the sandboxed persistent worker process.
+        # This isolates potentially expensive or unsafe executions from the
+        # main process without paying a process start-up per call.
         try:
-            rc, out, err = subprocess_runner.run_code_in_subprocess(
-                code, timeout_s=int(settings.get("timeout_s", 2))
+            rc, out, err = subprocess_runner.run_code_in_worker(
+                code, timeout_s=float(settings.get("timeout_s", 2))
             )
         except Exception as e:
             return {
@@ -1550,25 +2377,37 @@ class Interpreter:
                 "errors": None,
             }
 
-    def _compute_eco(self, total_ops: int, duration_s: float) -> Dict[str, Any]:
+    def _run_config(self, settings: Mapping[str, Any]) -> _RunConfig:
+        """Snapshot the eco tunables for a run with `settings` applied."""
+        return _RunConfig(
+            settings.get("energy_per_op_J", self.energy_per_op_J),
+            settings.get("idle_power_W", self.idle_power_W),
+            settings.get("co2_per_kwh_g", self.co2_per_kwh_g),
+        )
+
+    def _compute_eco(
+        self, total_ops: int, duration_s: float, config: Optional[_RunConfig] = None
+    ) -> Dict[str, Any]:
         # compute a simple energy estimate based on operation counts and
         # a small runtime idle-power overhead. Units: Joules and kWh.
-        compute_energy_J = total_ops * self.energy_per_op_J
-        runtime_overhead_J = duration_s * self.idle_power_W
-        total_energy_kWh = (compute_energy_J + runtime_overhead_J) / 3_600_000.0
-        co2_g = total_energy_kWh * self.co2_per_kwh_g
-        eco = {
+        # The result is built as one literal with the energy sum computed once.
+        # Without a run `config` the instance tunables are used.
+        energy_per_op_J, idle_power_W, co2_per_kwh_g = config or (
+            self.energy_per_op_J,
+            self.idle_power_W,
+            self.co2_per_kwh_g,
+        )
+        energy_J = total_ops * energy_per_op_J + duration_s * idle_power_W
+        energy_kWh = energy_J / 3_600_000.0
+        return {
             "total_ops": total_ops,
-            "energy_J": compute_energy_J + runtime_overhead_J,
-            "energy_kWh": total_energy_kWh,
-            "co2_g": co2_g,
-            "tips": [],
+            "energy_J": energy_J,
+            "energy_kWh": energy_kWh,
+            "co2_g": energy_kWh * co2_per_kwh_g,
+            "tips": ["Consider reducing loop iterations or heavy math operations"]
+            if total_ops > 1000
+            else [],
         }
-        if total_ops > 1000:
-            eco["tips"].append(
-                "Consider reducing loop iterations or heavy math operations"
-            )
-        return eco
 
 
     def run(
@@ -1577,12 +2416,19 @@ class Interpreter:
         inputs: Optional[Dict[str, Any]] = None,
         settings: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        # Entry-point for running source text. We delegate heavy lifting to
-        # `_prepare_and_execute` which handles subprocess fast-paths and
-        # delegates to `_execute_core` for the main interpreter loop.
-        output_lines, warnings, total_ops, maybe_err, start_time = (
-            self._prepare_and_execute(code, inputs, settings)
-        )
+        # Entry-point for running source text. The subprocess gate lives here
+        # so the common in-process path calls `_execute_core` directly; absent
+        # arguments share the read-only `_EMPTY` mapping instead of new dicts.
+        run_inputs: Mapping[str, Any] = inputs or _EMPTY
+        run_settings: Mapping[str, Any] = settings or _EMPTY
+        if run_settings.get("use_subprocess"):
+            output_lines, warnings, total_ops, maybe_err, start_time = (
+                self._run_subprocess_path(code, run_settings)
+            )
+        else:
+            output_lines, warnings, total_ops, maybe_err, start_time = (
+                self._execute_core(code, run_inputs, run_settings)
+            )
         if maybe_err.get("errors"):
             return {
                 "output": "\n".join(output_lines),
@@ -1591,112 +2437,206 @@ class Interpreter:
                 "errors": maybe_err["errors"],
             }
 
-        return self._finalize_run(output_lines, warnings, total_ops, start_time)
+        return self._finalize_run(
+            output_lines,
+            warnings,
+            total_ops,
+            start_time,
+            self._run_config(run_settings),
+        )
 
-    def _prepare_and_execute(
+    def _run_subprocess_path(
         self,
         code: str,
-        inputs: Optional[Dict[str, Any]],
-        settings: Optional[Dict[str, Any]],
+        settings: Mapping[str, Any],
     ) -> Tuple[List[str], List[str], int, Dict[str, Any], float]:
-        # thin wrapper: validation and delegation to core executor
-        # normalize optionals into typed locals for mypy
-        # Normalize optional arguments to concrete locals (helps static checks)
-        inputs_local: Dict[str, Any] = inputs or {}
-        settings_local: Dict[str, Any] = settings or {}
-
         # Subprocess fast-path: if the caller requested execution in an
         # isolated subprocess, forward to the subprocess helper which returns
         # a small result dict. This avoids the interpreter loop entirely.
-        if settings_local.get("use_subprocess"):
-            res = self._maybe_run_in_subprocess(settings_local, code)
-            return (
-                res.get("output", "").splitlines(),
-                res.get("warnings", []),
-                0,
-                res.get("errors") or {},
-                time.time(),
-            )
-
-        # otherwise run the normal in-process interpreter core
-        return self._execute_core(code, inputs_local, settings_local)
+        res = self._maybe_run_in_subprocess(settings, code)
+        return (
+            res.get("output", "").splitlines(),
+            res.get("warnings", []),
+            0,
+            res.get("errors") or {},
+            time.time(),
+        )
 
     def _execute_core(
         self,
         code: str,
-        inputs: Dict[str, Any],
-        settings: Dict[str, Any],
+        inputs: Mapping[str, Any],
+        settings: Mapping[str, Any],
         initial_env: Optional[Dict[str, Any]] = None,
+        lines: Optional[List[str]] = None,
     ) -> Tuple[List[str], List[str], int, Dict[str, Any], float]:
         """Core executor separated to reduce wrapper complexity.
 
+        `lines`, when given, is used instead of splitting `code`.
+
         Returns (output_lines, warnings, total_ops, maybe_err, start_time).
         """
-        # Core run loop: read lines, dispatch statements to handlers, enforce
-        # budgets (time/steps/output) and collect operation counts and output.
         start_time = time.time()
-        # seed environment from initial_env for nested interpreters
-        env: Dict[str, Any] = dict(initial_env) if initial_env is not None else {}
-        output_lines: List[str] = []
-        warnings: List[str] = []
-        total_ops = 0
-        ops_scale = 1.0
+        # limits may have changed since the last run on this instance
+        self._call_memo.clear()
+        # seed environment from initial_env for nested interpreters; a
+        # preparsed block that cannot bind anything runs on it directly,
+        # since the copy would only ever be read
+        env: Dict[str, Any]
+        if initial_env is None:
+            env = {}
+        elif isinstance(lines, _Program) and not lines.writes_env():
+            env = initial_env
+        else:
+            env = dict(initial_env)
+
+        output_lines, warnings, total_ops, maybe_err = self._execute_lines(
+            _compile_program(code) if lines is None else lines, inputs, env
+        )
+        return output_lines, warnings, total_ops, maybe_err, start_time
 
-        # Apply eco-related tunables from settings if present
-        self.energy_per_op_J = settings.get("energy_per_op_J", self.energy_per_op_J)
-        self.idle_power_W = settings.get("idle_power_W", self.idle_power_W)
-        self.co2_per_kwh_g = settings.get("co2_per_kwh_g", self.co2_per_kwh_g)
+    def _execute_lines(
+        self,
+        lines: List[str],
+        inputs: Mapping[str, Any],
+        env: Dict[str, Any],
+    ) -> Tuple[List[str], List[str], int, Dict[str, Any]]:
+        """Run `lines` against `env` (mutated in place).
+
+        Output is streamed into an `io.StringIO` (one item per line) and its
+        length is kept as a running total, so the `max_output_chars` check is
+        O(1) per item instead of re-summing every line written so far.
 
-        lines = code.splitlines()
+        Returns (output_lines, warnings, total_ops, maybe_err).
+        """
+        # Core run loop: read lines, dispatch statements to handlers, enforce
+        # budgets (time/steps/output) and collect operation counts and output.
+        # Output goes to `out_buf` rather than `state.out`; `state.warns` is
+        # the run's warnings list.
+        state = _InterpState(_as_program(lines), env, inputs)
+        stripped = state.lines.stripped
+        kinds = state.lines.kinds
+        n = len(stripped)
+        out_buf = io.StringIO()
+        # chars written so far, excluding the newline written after each item
+        out_chars = 0
+        warnings = state.warns
+        # ops charged by handlers; the dispatch cost is steps_local * other_cost
+        ops = 0
+        # loop-invariant attributes as locals
+        max_steps = self.max_steps
+        max_out = self.max_output_chars
+        other_cost = self._other_cost
+        dispatch = self._dispatch_statement
+        handlers = _STATEMENT_HANDLERS
+        reads_total = _READS_TOTAL_OPS
+        env_get = env.get
+        # only programs that can read the op counter pay for syncing it, and
+        # only programs that can change the op scale re-read it per statement
+        sync_ops = state.lines.reads_ops()
+        rescale = state.lines.writes_scale()
+        state.ops_scale = env_get("_ops_scale", 1.0)
 
         i = 0
         steps_local = 0
-        start_wall = time.time()
-        while i < len(lines):
-            raw = lines[i]
-            # enforce wall-clock timeout per-run
-            if time.time() - start_wall > self.max_time_s:
-                return output_lines, warnings, total_ops, {"errors": {"code": "TIMEOUT", "message": "Time limit exceeded"}}, start_time
+        deadline = _deadline_ns(self.max_time_s)
+        while i < n:
+            # enforce wall-clock timeout per-run, reading the clock every
+            # _DEADLINE_CHECK_MASK + 1 statements
+            if (
+                not steps_local & _DEADLINE_CHECK_MASK
+                and time.monotonic_ns() > deadline
+            ):
+                return (
+                    _buffered_lines(out_buf),
+                    warnings,
+                    ops + steps_local * other_cost,
+                    {"errors": {"code": "TIMEOUT", "message": "Time limit exceeded"}},
+                )
             # enforce overall step budget (cheap check to avoid long loops)
-            if steps_local > self.max_steps:
+            if steps_local > max_steps:
                 # Record a human-readable warning in addition to the structured
                 # STEP_LIMIT error so callers and tests can surface both forms.
                 warnings.append("Step limit exceeded")
-                return output_lines, warnings, total_ops, {"errors": {"code": "STEP_LIMIT", "message": "Step limit exceeded"}}, start_time
-            line = raw.strip()
-            if not line or line.startswith("#"):
+                return (
+                    _buffered_lines(out_buf),
+                    warnings,
+                    ops + steps_local * other_cost,
+                    {
+                        "errors": {
+                            "code": "STEP_LIMIT",
+                            "message": "Step limit exceeded",
+                        }
+                    },
+                )
+            line = stripped[i]
+            kind = kinds[i]
+            if kind == _S_BLANK:
                 i += 1
                 continue
             steps_local += 1
-            ops_scale_local = env.get("_ops_scale", ops_scale)
-            # charge a small 'other' op cost for the dispatch itself
-            total_ops += self.ops_map.get("other", 5)
-            # keep ecoOps() in sync
-            env["_eco_ops"] = total_ops
-            new_i, ops_delta, out_add, warn_add, err = self._dispatch_statement(
-                lines,
-                i,
-                line,
-                env,
-                inputs,
-                output_lines,
-                warnings,
-                total_ops,
-                ops_scale_local,
+            if rescale:
+                state.ops_scale = env_get("_ops_scale", 1.0)
+            # the small 'other' op cost for the dispatch itself is charged as
+            # steps_local * other_cost; keep ecoOps() in sync
+            if sync_ops:
+                env["_eco_ops"] = ops + steps_local * other_cost
+            state.i = i
+            if reads_total[kind]:
+                state.total_ops = ops + steps_local * other_cost
+            handler = handlers[kind]
+            new_i, ops_delta, out_add, warn_add, err = (
+                dispatch(state, line) if handler is None else handler(self, state, line)
             )
             if err:
-                # handlers return structured error dicts which the API surfaces
-                return output_lines, warnings, total_ops, {"errors": err}, start_time
-            if out_add:
-                # enforce output length cap incrementally to avoid large memory
-                # usage and to provide an early OUTPUT_LIMIT error if exceeded.
-                for o in out_add:
-                    if sum(len(x) for x in output_lines) + len(o) > self.max_output_chars:
-                        return output_lines, warnings, total_ops, {"errors": {"code": "OUTPUT_LIMIT", "message": "Output length limit reached"}}, start_time
-                    output_lines.append(o)
-            if warn_add:
-                warnings.extend(warn_add)
-            total_ops += ops_delta
+                # handlers return structured error dicts which the API surfaces;
+                # table handlers' errors get position info (`dispatch` did that)
+                err = err if handler is None else self._position_error(err, i, line)
+                return (
+                    _buffered_lines(out_buf),
+                    warnings,
+                    ops + steps_local * other_cost,
+                    {"errors": err},
+                )
+            # enforce output length cap incrementally to avoid large memory
+            # usage and to provide an early OUTPUT_LIMIT error if exceeded.
+            new_total = (
+                _buffer_output(out_buf, out_add, out_chars, max_out)
+                if out_add
+                else out_chars
+            )
+            if new_total is None:
+                return (
+                    _buffered_lines(out_buf),
+                    warnings,
+                    ops + steps_local * other_cost,
+                    {
+                        "errors": {
+                            "code": "OUTPUT_LIMIT",
+                            "message": "Output length limit reached",
+                        }
+                    },
+                )
+            out_chars = new_total
+            warnings += warn_add
+            ops += ops_delta
             i = new_i
-        return output_lines, warnings, total_ops, {}, start_time
-
+        return _buffered_lines(out_buf), warnings, ops + steps_local * other_cost, {}
+
+
+
+# Kind-indexed handlers for the statements `_dispatch_statement` normalizes.
+# All share the signature (self, state, line) and return the unified 5-tuple,
+# so dispatch is one list index and one call.
+_STATEMENT_HANDLERS: List[Any] = [None] * _S_COUNT
+_STATEMENT_HANDLERS[_S_SAY] = Interpreter._dispatch_say
+_STATEMENT_HANDLERS[_S_LET] = Interpreter._dispatch_let
+_STATEMENT_HANDLERS[_S_WARN] = Interpreter._dispatch_warn
+_STATEMENT_HANDLERS[_S_CONST] = Interpreter._dispatch_const
+_STATEMENT_HANDLERS[_S_ASK] = Interpreter._dispatch_ask
+_STATEMENT_HANDLERS[_S_FUNC] = Interpreter._dispatch_func_def
+_STATEMENT_HANDLERS[_S_CALL] = Interpreter._dispatch_func_call
+_STATEMENT_HANDLERS[_S_IF] = Interpreter._handle_if
+_STATEMENT_HANDLERS[_S_REPEAT] = Interpreter._handle_repeat
+_STATEMENT_HANDLERS[_S_WHILE] = Interpreter._handle_while
+_STATEMENT_HANDLERS[_S_FOR] = Interpreter._handle_for
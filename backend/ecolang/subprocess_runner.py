@@ -14,16 +14,28 @@ Behavior and guarantees:
   - The function returns (returncode, stdout, stderr). A returncode of -1
     indicates the process was terminated due to timeout.
 
+`PersistentWorker` keeps one worker process alive (started with `--serve`)
+and sends it newline-delimited JSON requests, so repeated calls skip the
+Python interpreter start-up. `run_code_in_worker` routes through a shared
+`WorkerPool` of such workers and has the same return contract as
+`run_code_in_subprocess`.
+
 Note: This is not a substitute for proper container/VM-based isolation in
 production. It reduces risk in CI and test environments.
 """
 
 import json
 import os
+import queue
+import select
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import IO, Any, Optional, Tuple
+
+_RUNNER_PATH = Path(__file__).parent / "_subprocess_worker.py"
 
 
 def _make_posix_preexec(cpu_seconds: Optional[int], mem_limit_mb: Optional[int]):
@@ -71,7 +83,7 @@ def run_code_in_subprocess(code: str, timeout_s: int = 2, *, cpu_seconds: Option
     Returns (returncode, stdout, stderr). On timeout the function will kill
     the process and return (-1, "", "TIMEOUT").
     """
-    runner_path = Path(__file__).parent / "_subprocess_worker.py"
+    runner_path = _RUNNER_PATH
     if not runner_path.exists():
         raise FileNotFoundError(str(runner_path))
 
@@ -113,3 +125,171 @@ def run_code_in_subprocess(code: str, timeout_s: int = 2, *, cpu_seconds: Option
         return -1, "", "TIMEOUT"
 
     return proc.returncode, out or "", err or ""
+
+
+class PersistentWorker:
+    """A long-lived `_subprocess_worker.py --serve` process, one call at a time.
+
+    Requests are framed as one JSON object per line (JSON text never contains
+    a raw newline). A call that exceeds its timeout kills the worker; the next
+    call transparently spawns a fresh one. RLIMIT_AS is applied at start-up.
+    RLIMIT_CPU counts the process's whole lifetime, so the worker itself
+    renews a `cpu_seconds` budget before each request instead; a call that
+    exhausts it gets the worker killed by SIGXCPU.
+    """
+
+    def __init__(
+        self, *, cpu_seconds: Optional[int] = 2, mem_limit_mb: Optional[int] = 200
+    ):
+        self._cpu_seconds = cpu_seconds
+        self._mem_limit_mb = mem_limit_mb
+        self._proc: Optional["subprocess.Popen[str]"] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> Tuple[IO[str], IO[str]]:
+        """Return the stdin/stdout pipes of a running worker, spawning it if needed."""
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            if not _RUNNER_PATH.exists():
+                raise FileNotFoundError(str(_RUNNER_PATH))
+            args = [sys.executable, str(_RUNNER_PATH), "--serve"]
+            if self._cpu_seconds is not None:
+                args.append(f"--cpu-seconds={int(self._cpu_seconds)}")
+            preexec = None
+            if os.name != "nt":
+                preexec = _make_posix_preexec(None, self._mem_limit_mb)
+            proc = self._proc = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                env={"PATH": os.environ.get("PATH", "")},
+                close_fds=True,
+                preexec_fn=preexec,
+            )
+        if proc.stdin is None or proc.stdout is None:
+            raise RuntimeError("worker started without stdin/stdout pipes")
+        return proc.stdin, proc.stdout
+
+    def _kill(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=1)
+        except Exception:
+            pass
+
+    def run(self, code: str, timeout_s: float = 2) -> Tuple[int, str, str]:
+        """Send `code` to the worker and return (returncode, stdout, stderr).
+
+        Mirrors `run_code_in_subprocess`: (0, "<json>", "") on success and
+        (-1, "", "TIMEOUT") when the worker does not answer in time.
+        """
+        request = json.dumps({"code": code}) + "\n"
+        with self._lock:
+            stdin, stdout = self._ensure_started()
+            try:
+                stdin.write(request)
+                stdin.flush()
+            except (BrokenPipeError, OSError):
+                # the previous worker died (e.g. hit RLIMIT_AS); retry once
+                self._kill()
+                stdin, stdout = self._ensure_started()
+                stdin.write(request)
+                stdin.flush()
+            ready, _, _ = select.select([stdout], [], [], timeout_s)
+            if not ready:
+                self._kill()
+                return -1, "", "TIMEOUT"
+            line = stdout.readline()
+            if not line:
+                rc = self._proc.poll() if self._proc is not None else None
+                self._kill()
+                return rc if rc else 1, "", "worker exited"
+            return 0, line.rstrip("\n"), ""
+
+    def close(self) -> None:
+        """Stop the worker process, if running."""
+        with self._lock:
+            self._kill()
+
+
+class WorkerPool:
+    """A fixed set of `PersistentWorker`s; each call borrows an idle one.
+
+    A runaway call only ties up its own worker until its timeout instead of
+    queueing every other caller behind it. Workers spawn lazily on first use,
+    and the most recently returned (already running) worker is reused first.
+    """
+
+    def __init__(self, size: int, **worker_kwargs: Any):
+        self._workers = [
+            PersistentWorker(**worker_kwargs) for _ in range(max(1, size))
+        ]
+        self._idle: "queue.LifoQueue[PersistentWorker]" = queue.LifoQueue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def run(self, code: str, timeout_s: float = 2) -> Tuple[int, str, str]:
+        """Run `code` on an idle worker, with the `PersistentWorker.run` contract.
+
+        Waiting for a free worker counts against `timeout_s`.
+        """
+        deadline = time.monotonic() + timeout_s
+        try:
+            worker = self._idle.get(timeout=timeout_s)
+        except queue.Empty:
+            return -1, "", "TIMEOUT"
+        try:
+            return worker.run(code, timeout_s=max(0.0, deadline - time.monotonic()))
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop every worker process that is running."""
+        for worker in self._workers:
+            worker.close()
+
+
+# Enough workers that a few runaway calls cannot stall the others, while
+# bounding how many sandbox processes one server keeps alive.
+_POOL_SIZE = min(4, os.cpu_count() or 1)
+_SHARED_POOL: Optional[WorkerPool] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_pool() -> WorkerPool:
+    """Return the process-wide `WorkerPool`, creating it on first use."""
+    global _SHARED_POOL
+    with _SHARED_LOCK:
+        if _SHARED_POOL is None:
+            _SHARED_POOL = WorkerPool(_POOL_SIZE)
+        return _SHARED_POOL
+
+
+def close_shared_pool() -> None:
+    """Stop the shared pool's workers, if the pool was ever created.
+
+    Unlike `get_shared_pool().close()`, this does not build a pool just to
+    close it when no sandbox call happened. A later call to
+    `get_shared_pool` starts a fresh pool.
+    """
+    global _SHARED_POOL
+    with _SHARED_LOCK:
+        pool, _SHARED_POOL = _SHARED_POOL, None
+    if pool is not None:
+        pool.close()
+
+
+def run_code_in_worker(code: str, timeout_s: float = 2) -> Tuple[int, str, str]:
+    """Run `code` on the shared pool of persistent workers.
+
+    Falls back to a one-shot `run_code_in_subprocess` on Windows, where
+    `select` cannot wait on pipes.
+    """
+    if os.name == "nt":
+        return run_code_in_subprocess(code, timeout_s=int(timeout_s))
+    return get_shared_pool().run(code, timeout_s=timeout_s)
@@ -0,0 +1,37 @@
+"""NDJSON output of /stats/stream, including rows with corrupt stored tips."""
+
+import importlib
+import json
+
+from fastapi.testclient import TestClient
+
+from backend import db
+from backend.app.main import app
+
+
+def test_stats_stream_emits_valid_lines_for_corrupt_tips(tmp_path, monkeypatch):
+    monkeypatch.setenv("ECOLANG_DB_PATH", str(tmp_path / "ecolang_test.db"))
+    importlib.reload(db)
+    try:
+        with TestClient(app) as client:
+            creds = {"username": "streamer", "password": "pw"}
+            token = client.post("/auth/register", json=creds).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            script = {"title": "s", "code": 'say "x"'}
+            sid = client.post("/save", json=script, headers=headers).json()["script_id"]
+
+            db.save_run(sid, 1.0, 2.0, 3.0, 4, 5, ["tip"])
+            bad = db.save_run(sid, 1.0, 2.0, 3.0, 4, 5, ["x"])
+            db.get_conn().execute(
+                "UPDATE Runs SET tips = '[abc' WHERE run_id = ?", (bad,)
+            )
+
+            r = client.get(f"/stats/stream?script_id={sid}", headers=headers)
+            assert r.status_code == 200
+            rows = [json.loads(line) for line in r.text.splitlines()]
+            assert sorted(row["tips"] for row in rows) == [[], ["tip"]]
+            listed = client.get(f"/stats?script_id={sid}", headers=headers).json()
+            assert rows == listed
+    finally:
+        monkeypatch.undo()
+        importlib.reload(db)
@@ -11,6 +11,11 @@ These tests are small and fast and do not require network access.
 """
 
 import json
+import os
+import threading
+import time
+
+import pytest
 
 from backend.app.main import _cap_settings
 from backend.ecolang.subprocess_runner import run_code_in_subprocess
@@ -70,3 +75,76 @@ result = 12345
     assert "result" in j and "error" in j
     assert j["error"] is None
     assert j["result"] == 12345
+
+
+@pytest.mark.skipif(os.name == "nt", reason="select() on pipes is POSIX-only")
+def test_persistent_worker_reuses_process_and_recovers_from_timeout():
+    """The persistent worker answers repeated calls and respawns after a timeout."""
+    from backend.ecolang.subprocess_runner import PersistentWorker
+
+    worker = PersistentWorker()
+    try:
+        rc, out, _ = worker.run("result = 1")
+        assert rc == 0 and json.loads(out)["result"] == 1
+        rc, _, err = worker.run("while 1:\n    pass", timeout_s=0.5)
+        assert rc == -1 and err == "TIMEOUT"
+        rc, out, _ = worker.run("result = 2")
+        assert rc == 0 and json.loads(out)["result"] == 2
+    finally:
+        worker.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="RLIMIT_CPU is POSIX-only")
+def test_persistent_worker_enforces_cpu_seconds_per_call():
+    """A call that exhausts its CPU budget ends well before the wall-clock timeout."""
+    from backend.ecolang.subprocess_runner import PersistentWorker
+
+    worker = PersistentWorker(cpu_seconds=1)
+    try:
+        rc, _, err = worker.run("while 1:\n    pass", timeout_s=10)
+        assert rc not in (0, -1) and err == "worker exited"
+        rc, out, _ = worker.run("result = 3")
+        assert rc == 0 and json.loads(out)["result"] == 3
+    finally:
+        worker.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="select() on pipes is POSIX-only")
+def test_worker_pool_serves_calls_while_one_worker_is_stuck():
+    """A runaway call ties up only its own worker, not the whole pool."""
+    from backend.ecolang.subprocess_runner import WorkerPool
+
+    pool = WorkerPool(2)
+    try:
+        stuck = threading.Thread(
+            target=pool.run, args=("while 1:\n    pass",), kwargs={"timeout_s": 1.5}
+        )
+        stuck.start()
+        time.sleep(0.2)
+        started = time.monotonic()
+        rc, out, _ = pool.run("result = 4", timeout_s=1)
+        assert rc == 0 and json.loads(out)["result"] == 4
+        assert time.monotonic() - started < 1
+        stuck.join()
+    finally:
+        pool.close()
+
+
+def test_subprocess_worker_returns_ints_wider_than_64_bits():
+    """Results orjson cannot encode fall back to the stdlib encoder."""
+    rc, out, err = run_code_in_subprocess("result = 2**70", timeout_s=2)
+    assert rc == 0, err
+    assert json.loads(out) == {"result": 2**70, "error": None}
+
+
+def test_close_shared_pool_does_not_create_a_pool():
+    """Closing never builds a pool, and closing a used pool resets it."""
+    from backend.ecolang import subprocess_runner
+
+    subprocess_runner.close_shared_pool()
+    subprocess_runner.close_shared_pool()
+    assert subprocess_runner._SHARED_POOL is None
+    pool = subprocess_runner.get_shared_pool()
+    assert subprocess_runner.get_shared_pool() is pool
+    subprocess_runner.close_shared_pool()
+    assert subprocess_runner._SHARED_POOL is None
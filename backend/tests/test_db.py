@@ -0,0 +1,142 @@
+"""Unit tests for the SQLite persistence helpers in `backend.db`."""
+
+import importlib
+import threading
+
+import pytest
+
+from backend import db
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Point `backend.db` at a throwaway SQLite file for each test."""
+    monkeypatch.setenv("ECOLANG_DB_PATH", str(tmp_path / "ecolang_test.db"))
+    importlib.reload(db)
+    db.init_db()
+    yield
+    monkeypatch.undo()
+    importlib.reload(db)
+
+
+def test_save_run_and_bulk_persist_rows():
+    sid = db.save_script("bulk", 'say "x"')
+    before = len(db.list_runs(sid))
+
+    db.save_run(sid, 1.0, 2.0, 3.0, 4, 5, ["single"])
+    written = db.save_runs_bulk([
+        (sid, 1.0, 2.0, 3.0, 4, 5, ["a"]),
+        (sid, 1.0, 2.0, 3.0, 4, 5),
+    ])
+    assert written == 2
+    assert db.save_runs_bulk([]) == 0
+
+    runs = db.list_runs(sid)
+    assert len(runs) == before + 3
+    assert all(isinstance(r["tips"], list) for r in runs)
+
+
+def test_iter_runs_matches_list_runs():
+    sid = db.save_script("stream", 'say "x"')
+    db.save_run(sid, 1.0, 2.0, 3.0, 4, 5, ["tip"])
+    streamed = list(db.iter_runs(sid))
+    assert streamed == db.list_runs(sid)
+    assert streamed[0]["tips"] == ["tip"]
+
+
+def test_script_reads_are_cached_and_invalidated_on_save():
+    assert db.get_script(10**9) is None
+    sid = db.save_script("cached", 'say "x"', user_id=4242)
+    first = db.get_script(sid)
+    assert first["title"] == "cached"
+    first["title"] = "mutated"
+    assert db.get_script(sid)["title"] == "cached"
+
+    assert sid in {s["script_id"] for s in db.list_scripts(4242)}
+    sid2 = db.save_script("cached2", 'say "y"', user_id=4242)
+    assert {sid, sid2} <= {s["script_id"] for s in db.list_scripts(4242)}
+
+
+def _plan(sql, params):
+    rows = db.get_conn().execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return " | ".join(r["detail"] for r in rows)
+
+
+def test_script_and_run_listings_are_served_from_indexes():
+    plan = _plan(
+        "SELECT script_id, title, created_at FROM Scripts WHERE user_id = ?"
+        " ORDER BY created_at DESC",
+        (1,),
+    )
+    assert "idx_scripts_user_created" in plan and "TEMP B-TREE" not in plan
+    plan = _plan(*db._runs_query(1))
+    assert "idx_runs_script_created_id" in plan and "TEMP B-TREE" not in plan
+
+
+def test_iter_runs_pages_through_many_rows_in_order():
+    sid = db.save_script("paged", 'say "x"')
+    db.save_runs_bulk([(sid, 1.0, 2.0, 3.0, n, 5) for n in range(1201)])
+    streamed = list(db.iter_runs(sid))
+    assert len(streamed) == 1201
+    assert len({r["run_id"] for r in streamed}) == 1201
+    assert streamed == db.list_runs(sid)
+
+
+def test_iter_runs_pages_are_index_range_reads():
+    after = ("2024-01-01 00:00:00", 10)
+    indexes = {None: "idx_runs_created_id", 3: "idx_runs_script_created_id"}
+    for script_id, index in indexes.items():
+        for same_time in (True, False):
+            sql, params = db._runs_query(script_id, after, db._RUNS_PAGE, same_time)
+            plan = _plan(sql, params)
+            assert index in plan and "TEMP B-TREE" not in plan, plan
+
+
+def test_iter_runs_pages_across_created_at_groups():
+    sid = db.save_script("groups", 'say "x"')
+    db.save_runs_bulk([(sid, 1.0, 2.0, 3.0, n, 5) for n in range(1300)])
+    # uneven tie groups, some spanning page boundaries, in no run_id order
+    db.get_conn().execute(
+        "UPDATE Runs"
+        " SET created_at = datetime('2024-01-01', (run_id * 7 % 5) || ' days')"
+    )
+    for script_id in (sid, None):
+        streamed = list(db.iter_runs(script_id))
+        assert len(streamed) == 1300
+        assert streamed == db.list_runs(script_id)
+
+
+def test_reads_and_caches_ignore_a_concurrent_write_that_rolls_back():
+    sid = db.save_script("committed", 'say "x"', user_id=7)
+    inserted, release = threading.Event(), threading.Event()
+
+    class AbortingStats(dict):
+        # save_script reads "tips" last, after inserting the script row
+        def get(self, key, default=None):
+            if key == "tips":
+                inserted.set()
+                release.wait(5)
+                raise RuntimeError("abort")
+            return super().get(key, default)
+
+    failures = []
+
+    def writer():
+        try:
+            db.save_script("doomed", 'say "y"', user_id=7, eco_stats=AbortingStats(x=1))
+        except RuntimeError as e:
+            failures.append(e)
+
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        assert inserted.wait(5)
+        # the doomed row exists only inside the writer's open transaction
+        assert db.get_script(sid + 1) is None
+        assert [s["script_id"] for s in db.list_scripts(7)] == [sid]
+    finally:
+        release.set()
+        t.join(5)
+    assert failures
+    assert db.get_script(sid + 1) is None
+    assert [s["script_id"] for s in db.list_scripts(7)] == [sid]
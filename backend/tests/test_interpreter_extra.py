@@ -1,6 +1,10 @@
 """Additional interpreter tests covering nested blocks and edge cases."""
 
-from backend.ecolang.interpreter import Interpreter
+import ast
+
+import pytest
+
+from backend.ecolang.interpreter import EvalError, Interpreter, SafeEvaluator, eval_expr
 
 
 def test_nested_if_else():
@@ -108,3 +112,206 @@ def test_repeat_missing_times_keyword():
     res = it.run('repeat 3\n  say 1\nend\n')
     assert res['errors'] is not None
     assert res['errors'].get('code') == 'SYNTAX_ERROR'
+
+
+def test_reset_clears_state_and_applies_caps():
+    it = Interpreter()
+    it.run('func f a\n  return a\nend\n')
+    assert it.run('call f with 1')['errors'] is None
+    it.reset({"max_steps": 7, "max_output_chars": 3})
+    assert it.run('call f with 1')['errors']['message'] == "Unknown function 'f'"
+    assert it.max_steps == 7 and it.max_output_chars == 3
+    it.reset()
+    assert it.max_steps == Interpreter().max_steps
+
+
+def test_expression_results_and_errors_are_stable_across_evaluations():
+    for _ in range(2):
+        assert eval_expr("1 + 2 * 3", {}) == 7
+        assert eval_expr("a + 2", {"a": 1}) == 3
+        assert eval_expr("a", {"a": "s"}) == "s"
+        assert eval_expr("true", {}) is True
+        with pytest.raises(EvalError, match="division by zero"):
+            eval_expr("1 / 0", {})
+        with pytest.raises(EvalError) as e:
+            eval_expr("1 +", {})
+        assert e.value.text == "1 +" and e.value.column
+
+
+def test_compiled_expressions_match_ecolang_semantics():
+    env = {"a": 1, "b": 0, "s": "x"}
+    assert eval_expr("s + a", env) == "x1"
+    assert eval_expr("a or 5", env) is True
+    assert eval_expr("at(append(array(), 7), 0)", env) == 7
+    assert eval_expr("ecoOps()", dict(env, _eco_ops=3)) == 3
+    for bad in ("2 ** 9", "missing", "__builtins__", "1 < 2 < 3", "[1]"):
+        with pytest.raises(EvalError):
+            eval_expr(bad, env)
+
+
+def test_repeat_iterations_do_not_leak_state():
+    it = Interpreter()
+    res = it.run(
+        'let a = 1\n'
+        'repeat 3 times\n  let a = a + 1\n  say a\n  func f\n  end\nend\n'
+        'say a\n'
+    )
+    assert res['errors'] is None
+    assert res['output'].splitlines() == ['2', '2', '2', '1']
+    assert it.functions == {}
+
+
+def test_repeat_replays_isolated_iterations():
+    res = Interpreter().run(
+        'repeat 4 times\n  let x = 2\n  say x * 3\n  warn "w"\nend\n'
+    )
+    assert res['errors'] is None
+    assert res['output'].splitlines() == ['6'] * 4
+    assert res['warnings'].count('w') == 4
+
+
+def test_repeat_step_limit_counts_ops_spent_before_it():
+    # neither loop exceeds max_steps alone, together they do
+    it = Interpreter()
+    it.max_steps = 1000
+    code = (
+        'let i = 0\n'
+        'while i < 40 then\n  let i = i + 1\nend\n'
+        'repeat 60 times\n  let y = 1\nend\n'
+        'say i\n'
+    )
+    res = it.run(code)
+    assert res['output'].splitlines() == ['40']
+    assert 'Step limit exceeded inside repeat; aborted' in res['warnings']
+    assert res['eco']['total_ops'] == 1065
+
+
+def test_rerunning_a_program_gives_identical_results():
+    code = 'let x = 0\nwhile x < 2 then\n  let x = x + 1\nend\nsay x\n'
+    it = Interpreter()
+    runs = [it.run(code), it.run(code), Interpreter().run(code)]
+    for res in runs:
+        assert res['output'] == '2\n' and res['errors'] is None
+        assert res['eco']['total_ops'] == 100
+
+
+def test_function_output_cap_counts_all_lines():
+    code = 'func f\n  for k = 1 to 20\n    say "xxxxxxxxxx"\n  end\nend\ncall f\n'
+    it = Interpreter()
+    it.max_output_chars = 55
+    capped = it.run(code)
+    assert capped['errors']['message'] == 'Output length limit reached in function'
+    it = Interpreter()
+    it.max_output_chars = 200
+    full = it.run(code)
+    assert full['errors'] is None and full['output'].count('x') == 200
+
+
+def test_for_header_step_and_errors():
+    it = Interpreter()
+    res = it.run('let n = 5\nfor i = 1 to n step 2\n  say i\nend')
+    assert res['output'] == '1\n3\n5\n' and res['eco']['total_ops'] == 195
+    for _ in range(2):
+        err = it.run('for 1x = 0 to 3\n  say 1\nend')['errors']
+        assert err['code'] == 'SYNTAX_ERROR'
+        assert err['message'] == 'Invalid loop variable name'
+        assert (err['line'], err['column']) == (1, 5)
+
+
+def test_for_integer_and_fractional_ranges():
+    it = Interpreter()
+    assert it.run('for i = 10 to 1 step -4\n  say i\nend')['output'] == '10\n6\n2\n'
+    assert it.run('for i = 0 to 1 step 0.5\n  say i\nend')['output'] == '0\n0.5\n1\n'
+    assert it.run('for i = 1 to 3 step -1\n  say i\nend')['output'] == ''
+
+
+def test_if_elif_else_inside_a_loop():
+    code = (
+        'for i = 1 to 3\n'
+        '  if i > 2 then\n    say i\n'
+        '  elif i > 1 then\n    say "e"\n'
+        '  else\n    say "z"\n'
+        '  end\n'
+        'end\n'
+    )
+    for _ in range(2):
+        res = Interpreter().run(code)
+        assert res['output'] == 'z\ne\n3\n' and res['eco']['total_ops'] == 200
+
+
+def test_eco_ops_reports_the_running_total():
+    res = Interpreter().run('let x = 1\nfor i = 1 to 3\n  say ecoOps()\nend\n')
+    assert res['output'] == '15\n15\n15\n' and res['eco']['total_ops'] == 195
+    code = 'let x = 1\nif x == 1 then\n  say ecoOps()\nend\nsay ecoOps()\n'
+    res = Interpreter().run(code)
+    assert res['output'] == '5\n75\n' and res['eco']['total_ops'] == 125
+
+
+def test_op_scale_changes_apply_to_later_statements():
+    assert Interpreter().run('say 1\nsay 2')['eco']['total_ops'] == 110
+    assert Interpreter().run('savePower 50\nsay 1\nsay 2')['eco']['total_ops'] == 65
+    res = Interpreter().run('let _ops_scale = 0.5\nsay 1\nsay 2')
+    assert res['eco']['total_ops'] == 70
+
+
+def test_if_branches_do_not_leak_bindings():
+    code = (
+        'let x = 1\n'
+        'if x == 1 then\n  say x\nend\n'
+        'if x == 1 then\n  let x = 2\nend\n'
+        'say x\n'
+    )
+    assert Interpreter().run(code)['output'] == '1\n1\n'
+
+
+def test_run_eco_settings_do_not_leak_into_the_instance():
+    it = Interpreter()
+    heavy = it.run('say 1', settings={'energy_per_op_J': 1.0, 'idle_power_W': 0.0})
+    assert heavy['eco']['energy_J'] == heavy['eco']['total_ops']
+    assert it.energy_per_op_J == Interpreter().energy_per_op_J
+    assert it.run('say 1')['eco']['energy_J'] < 1.0
+
+
+def test_safe_evaluator_matches_compiled_expressions():
+    env = {'x': 4, 's': 'a'}
+    for expr in ['x * 3 - 1 > 10 and not false', 's + x', '-x % 3', 'len(s) == 1']:
+        tree = ast.parse(expr, mode='eval')
+        assert SafeEvaluator(env).visit(tree) == eval_expr(expr, env)
+    with pytest.raises(EvalError):
+        SafeEvaluator(env).visit(ast.parse('[x]', mode='eval'))
+
+
+def test_literal_subtrees_inside_larger_expressions():
+    assert eval_expr('x * (60 + 5)', {'x': 2}) == 130
+    assert eval_expr('x + ("a" + 1)', {'x': 'q'}) == 'qa1'
+    with pytest.raises(EvalError):
+        eval_expr('x + 1 / 0', {'x': 1})
+
+
+def test_pure_function_calls_are_replayed():
+    code = (
+        'func sq a\n  say a\n  return a * a\nend\n'
+        'for i = 1 to 3\n  call sq with 2\n  call sq with true\nend\n'
+    )
+    it = Interpreter()
+    for _ in range(2):
+        res = it.run(code)
+        assert res['output'] == '2\n4\nTrue\n1\n' * 3
+        assert res['eco']['total_ops'] == 510
+    # bodies that read inputs are re-run on every call
+    res = it.run('func r\n  ask n\n  return n\nend\ncall r\ncall r', inputs={'n': 1})
+    assert res['output'] == '1\n1\n' and res['eco']['total_ops'] == 470
+
+
+def test_unsupported_operands_are_rejected_only_when_evaluated():
+    # skipped by the short-circuit: accepted, as with the reference evaluator
+    for expr in ('1 or 1 < 2 < 3', '1 or ~1', '1 or (1 if 1 else 2)', '0 and "s" @ 1'):
+        res = Interpreter().run(f'say {expr}')
+        assert res['errors'] is None, expr
+    res = Interpreter().run('let x = 0\nlet y = x or 1 < 2 < 3')
+    assert res['errors']['message'] == 'Chained comparisons not supported'
+    # keyword arguments to builtins are ignored, as before
+    assert Interpreter().run('say len("ab", a=1)')['output'] == '2\n'
+    # dangerous constructs are still rejected even where never evaluated
+    for expr in ('1 or x.y', '0 and __import__', '1 or foo(1)'):
+        assert Interpreter().run(f'say {expr}')['errors'] is not None, expr